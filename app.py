@@ -1,30 +1,98 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Form
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Form, Query, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from fastapi.responses import HTMLResponse, ORJSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import case, func, insert, select, text, update
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from starlette.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
 import models
 import schemas
+import assets
 import auth
-from database import get_db, init_db
+import backup
+import bus
+import events
+import fragments
+import metrics
+import profiler
+import pagination
+import revisions
+import search
+import serialize
+import transfer
+import write_queue
+import database
+from database import get_db, init_db, db_endpoint, retry_on_locked, run_db
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import logging
+from response_cache import ALL, TAIL, response_cache, cache_key, page_scopes, wishlist_scope
 import os
 from datetime import datetime
 from typing import Optional
 from datetime import timedelta
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for a `backup.py restore` into the running app's database
+RESTORE_CHECK_INTERVAL = float(os.getenv("WISHLIST_RESTORE_CHECK_INTERVAL", "1"))
+
+async def watch_restores():
+    # The restored data replaced what this worker cached: pages, sign-ins of
+    # users that may no longer exist, and the state live viewers are showing
+    seen = backup.restore_marker()
+    while True:
+        await asyncio.sleep(RESTORE_CHECK_INTERVAL)
+        marker = backup.restore_marker()
+        if marker is None or marker == seen:
+            continue
+        seen = marker
+        logger.warning(f"Database restored from {marker['snapshot']}; dropping cached responses and sign-ins")
+        response_cache.invalidate(marker["revision"])
+        auth.invalidate_user(None, relay=False)
+        events.hub.resync()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once per worker, not on import, so tools importing app stay cheap
+    await run_in_threadpool(init_db)
+    bus.start()
+    restores = asyncio.create_task(watch_restores())
+    yield
+    restores.cancel()
+    bus.stop()
+    # aiosqlite keeps a worker thread per pooled connection
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(database.engine)
+    if database.async_engine is not None:
+        metrics.instrument_engine(database.async_engine.sync_engine)
+
+if profiler.PROFILE_SLOW_MS > 0:
+    app.add_middleware(profiler.SlowRequestProfiler)
 
 # Mount static files
 static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+app.mount("/static", assets.AssetFiles(directory=static_dir), name="static")
 
-# Set up templates
+# Set up templates on the first page render; jinja isn't needed to pass /health
 templates_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
-templates = Jinja2Templates(directory=templates_dir)
 
-# Initialize database
-init_db()
+@functools.lru_cache(maxsize=None)
+def get_templates():
+    from fastapi.templating import Jinja2Templates
+
+    templates = Jinja2Templates(directory=templates_dir)
+    templates.env.globals["asset_url"] = assets.asset_url
+    return templates
 
 # Page routes
 @app.get("/", response_class=HTMLResponse)
@@ -37,13 +105,27 @@ async def viewer(request: Request, db: Session = Depends(get_db)):
         current_user = await auth.get_current_user(request, db)
     except HTTPException:
         current_user = None
-    return templates.TemplateResponse("viewer.html", {"request": request, "user": current_user})
+    # The page greets the signed-in user, so each user gets their own entry
+    key = cache_key(request, current_user.id if current_user else None)
+    cached = response_cache.lookup(request, key)
+    if cached is not None:
+        return cached
+    context = {"request": request, "user": current_user, "wishlists_html": None}
+    if fragments.VIEWER_SSR:
+        revision, wishlists = await run_db(db, fragments.load_wishlists)
+        # Rendering a cold page is CPU work; keep it off the event loop
+        context["wishlists_html"] = await run_in_threadpool(fragments.render_wishlists, get_templates().env, wishlists)
+    else:
+        revision, _ = await run_db(db, revisions.current_revision)
+    context["revision"] = revision
+    page = get_templates().TemplateResponse("viewer.html", context)
+    return response_cache.store(key, revision, page.body, "text/html", {})
 
 @app.get("/creator", response_class=HTMLResponse)
 async def creator(request: Request, db: Session = Depends(get_db)):
     try:
         current_user = await auth.get_current_user(request, db)
-        return templates.TemplateResponse("creator.html", {"request": request, "user": current_user})
+        return get_templates().TemplateResponse("creator.html", {"request": request, "user": current_user})
     except HTTPException as e:
         if e.status_code == status.HTTP_401_UNAUTHORIZED:
             # Log the error for debugging
@@ -53,11 +135,11 @@ async def creator(request: Request, db: Session = Depends(get_db)):
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return get_templates().TemplateResponse("login.html", {"request": request})
 
 @app.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+    user = await auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -85,7 +167,7 @@ async def logout():
 
 @app.get("/register", response_class=HTMLResponse)
 async def register_page(request: Request):
-    return templates.TemplateResponse("register.html", {"request": request})
+    return get_templates().TemplateResponse("register.html", {"request": request})
 
 @app.post("/register")
 async def register(
@@ -94,21 +176,134 @@ async def register(
     email: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
-    db_user = db.query(models.User).filter(models.User.username == username).first()
+    db_user = await run_db(db, auth.get_user_by_username, username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
     user = schemas.UserCreate(username=username, email=email, password=password)
-    db_user = auth.create_user(db, user)
+    db_user = await auth.create_user(db, user)
     return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
 
+# Upper bound on rows created by one bulk request
+MAX_BULK_SIZE = int(os.getenv("WISHLIST_MAX_BULK_SIZE", "5000"))
+
+# Most rows /api/changes returns before telling the client to refetch instead
+MAX_CHANGES = int(os.getenv("WISHLIST_MAX_CHANGES", "5000"))
+
+def check_bulk_size(count: int) -> None:
+    if count > MAX_BULK_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Bulk requests are limited to {MAX_BULK_SIZE} rows"
+        )
+
+def item_insert_rows(wishlist_id: int, items: list[schemas.ItemCreate], now: datetime) -> list[dict]:
+    return [
+        {"name": item.name, "link": item.link, "wishlist_id": wishlist_id, "purchased": False, "created_at": now}
+        for item in items
+    ]
+
+def insert_returning(db: Session, table, rows: list[dict]) -> list[dict]:
+    """Insert rows with one executemany, then read them back with one SELECT.
+
+    Results line up with `rows`. An empty list must not reach db.execute(),
+    which would run it as a single INSERT of all-default values.
+    """
+    if not rows:
+        return []
+    db.execute(insert(table), rows)
+    # The transaction holds SQLite's write lock, so each row got the next
+    # rowid: the batch is the id range ending at last_insert_rowid()
+    last_id = func.last_insert_rowid()
+    created = db.execute(
+        select(*table.columns).where(table.c.id.between(last_id - len(rows) + 1, last_id)).order_by(table.c.id)
+    ).mappings().all()
+    if len(created) != len(rows):
+        raise RuntimeError(f"Inserted {len(rows)} rows into {table.name} but read back {len(created)}")
+    return [dict(row) for row in created]
+
+def insert_items(db: Session, rows: list[dict]) -> list[dict]:
+    # INSERT ... RETURNING instead of an INSERT and a refresh SELECT per item
+    return insert_returning(db, models.Item.__table__, rows)
+
+# Operational endpoints
+@app.get("/health")
+async def health(db: Session = Depends(get_db)):
+    # A real round-trip to SQLite, so a wedged database fails the healthcheck
+    try:
+        await run_db(db, lambda session: session.execute(text("SELECT 1")).scalar_one())
+    except Exception as e:
+        return ORJSONResponse({"status": "error", "detail": str(e)}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # API endpoints
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {"principal": auth.principal_cache.stats(), "responses": response_cache.stats()}
+
+# Pydantic path for WISHLIST_FAST_JSON=false
+wishlists_json = TypeAdapter(list[schemas.Wishlist])
+
 @app.get("/api/wishlists", response_model=list[schemas.Wishlist])
-def get_wishlists(db: Session = Depends(get_db)):
-    wishlists = db.query(models.Wishlist).all()
-    return wishlists
+@db_endpoint
+def get_wishlists(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    person: Optional[str] = None,
+    purchased: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    key = cache_key(request)
+    cached = response_cache.lookup(request, key)
+    if cached is not None:
+        return cached
+
+    not_modified = revisions.conditional_response(request, response, db)
+    if not_modified:
+        return not_modified
+
+    if serialize.FAST_JSON:
+        # Plain column tuples; items are attached by serialize.wishlist_tree
+        query = db.query(*serialize.WISHLIST_COLUMNS)
+    else:
+        # Load every wishlist's items in one extra SELECT ... WHERE wishlist_id IN (...)
+        # instead of one lazy load per wishlist during serialization.
+        items = models.Wishlist.items
+        if purchased is not None:
+            items = items.and_(models.Item.purchased == purchased)
+        query = db.query(models.Wishlist).options(selectinload(items))
+    if owner_id is not None:
+        query = query.filter(models.Wishlist.owner_id == owner_id)
+    if person is not None:
+        query = query.filter(models.Wishlist.person == person)
+
+    if limit is None:
+        # Unpaginated legacy behaviour: the whole tree in one response
+        wishlists = query.order_by(models.Wishlist.created_at, models.Wishlist.id).all()
+        scopes = (ALL,)
+    else:
+        wishlists, next_cursor = pagination.paginate(query, models.Wishlist, cursor, limit)
+        pagination.set_next_cursor(response, next_cursor)
+        # A page only changes with its own wishlists, or when new ones are
+        # appended to it
+        scopes = page_scopes((wishlist.id for wishlist in wishlists), last_page=next_cursor is None)
+
+    if serialize.FAST_JSON:
+        body = serialize.dumps(serialize.wishlist_tree(db, wishlists, purchased))
+    else:
+        body = wishlists_json.dump_json(wishlists_json.validate_python(wishlists, from_attributes=True))
+    return response_cache.store(key, request.state.revision, body, "application/json", response.headers, scopes)
 
 @app.post("/api/wishlists", response_model=schemas.Wishlist)
+@retry_on_locked
+@db_endpoint
 def create_wishlist(
     wishlist: schemas.WishlistCreate,
     current_user: schemas.User = Depends(auth.get_current_user),
@@ -121,11 +316,56 @@ def create_wishlist(
         created_at=datetime.utcnow()
     )
     db.add(db_wishlist)
+    db.flush()
+    revision = revisions.bump_revision(db, [("wishlist", db_wishlist.id)])
     db.commit()
+    response_cache.invalidate(revision, [TAIL])
     db.refresh(db_wishlist)
+    # A new wishlist has no items; mark the collection loaded instead of
+    # leaving a lazy SELECT for response serialization
+    set_committed_value(db_wishlist, "items", [])
+    events.hub.publish("wishlists.created", [schemas.Wishlist.model_validate(db_wishlist)], revision, [db_wishlist.id])
     return db_wishlist
 
+@app.post("/api/wishlists/bulk", response_model=list[schemas.Wishlist])
+@retry_on_locked
+@db_endpoint
+def create_wishlists_bulk(
+    wishlists: list[schemas.WishlistTreeCreate],
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    check_bulk_size(len(wishlists) + sum(len(w.items) for w in wishlists))
+    if not wishlists:
+        return []
+    now = datetime.utcnow()
+    created = insert_returning(db, models.Wishlist.__table__, [
+        {"name": w.name, "person": w.person, "owner_id": current_user.id, "created_at": now}
+        for w in wishlists
+    ])
+    tree = [{**row, "items": []} for row in created]
+
+    item_rows = [
+        row
+        for wishlist, new in zip(wishlists, created)
+        for row in item_insert_rows(new["id"], wishlist.items, now)
+    ]
+    if item_rows:
+        by_id = {wishlist["id"]: wishlist for wishlist in tree}
+        for item in insert_items(db, item_rows):
+            by_id[item["wishlist_id"]]["items"].append(item)
+
+    changes = [("wishlist", wishlist["id"]) for wishlist in tree]
+    changes += [("item", item["id"]) for wishlist in tree for item in wishlist["items"]]
+    revision = revisions.bump_revision(db, changes)
+    db.commit()
+    response_cache.invalidate(revision, [TAIL])
+    events.hub.publish("wishlists.created", tree, revision, [wishlist["id"] for wishlist in tree])
+    return tree
+
 @app.delete("/api/wishlists/{wishlist_id}")
+@retry_on_locked
+@db_endpoint
 def delete_wishlist(
     wishlist_id: int,
     current_user: schemas.User = Depends(auth.get_current_user),
@@ -137,48 +377,177 @@ def delete_wishlist(
     if wishlist.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this wishlist")
     
+    # The cascade deletes the items too; log them so delta clients drop them
+    changes = [("wishlist", wishlist_id)] + [("item", item.id) for item in wishlist.items]
     db.delete(wishlist)
+    revision = revisions.bump_revision(db, changes)
     db.commit()
+    response_cache.invalidate(revision, [wishlist_scope(wishlist_id)])
+    events.hub.publish("wishlist.deleted", {"id": wishlist_id}, revision, [wishlist_id])
     return {"message": "Wishlist deleted"}
 
 @app.post("/api/wishlists/{wishlist_id}/items", response_model=schemas.Item)
+@retry_on_locked
+@db_endpoint
 def create_item(
     wishlist_id: int,
     item: schemas.ItemCreate,
     current_user: schemas.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
+    def add_item(db):
+        wishlist = db.query(models.Wishlist).filter(models.Wishlist.id == wishlist_id).first()
+        if not wishlist:
+            raise HTTPException(status_code=404, detail="Wishlist not found")
+        if wishlist.owner_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to add items to this wishlist")
+
+        db_item = models.Item(
+            name=item.name,
+            link=item.link,
+            wishlist_id=wishlist_id,
+            purchased=False,
+            created_at=datetime.utcnow()
+        )
+        db.add(db_item)
+        db.flush()
+        revision = revisions.bump_revision(db, [("item", db_item.id)])
+        return schemas.Item.model_validate(db_item), revision
+
+    created, revision = write_queue.run_write(db, add_item)
+    response_cache.invalidate(revision, [wishlist_scope(wishlist_id)])
+    events.hub.publish("items.created", [created], revision, [wishlist_id])
+    return created
+
+@app.post("/api/wishlists/{wishlist_id}/items/bulk", response_model=list[schemas.Item])
+@retry_on_locked
+@db_endpoint
+def create_items_bulk(
+    wishlist_id: int,
+    items: list[schemas.ItemCreate],
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    check_bulk_size(len(items))
     wishlist = db.query(models.Wishlist).filter(models.Wishlist.id == wishlist_id).first()
     if not wishlist:
         raise HTTPException(status_code=404, detail="Wishlist not found")
     if wishlist.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to add items to this wishlist")
-    
-    db_item = models.Item(
-        name=item.name,
-        link=item.link,
-        wishlist_id=wishlist_id,
-        purchased=False,
-        created_at=datetime.utcnow()
-    )
-    db.add(db_item)
+    if not items:
+        return []
+
+    created = insert_items(db, item_insert_rows(wishlist_id, items, datetime.utcnow()))
+    revision = revisions.bump_revision(db, [("item", item["id"]) for item in created])
     db.commit()
-    db.refresh(db_item)
-    return db_item
+    response_cache.invalidate(revision, [wishlist_scope(wishlist_id)])
+    events.hub.publish("items.created", created, revision, [wishlist_id])
+    return created
+
+@app.get("/api/items", response_model=list[schemas.Item])
+@db_endpoint
+def get_items(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    wishlist_id: Optional[int] = None,
+    purchased: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    not_modified = revisions.conditional_response(request, response, db)
+    if not_modified:
+        return not_modified
+
+    query = db.query(*serialize.ITEM_COLUMNS) if serialize.FAST_JSON else db.query(models.Item)
+    if wishlist_id is not None:
+        query = query.filter(models.Item.wishlist_id == wishlist_id)
+    if purchased is not None:
+        query = query.filter(models.Item.purchased == purchased)
+
+    items, next_cursor = pagination.paginate(query, models.Item, cursor, limit)
+    pagination.set_next_cursor(response, next_cursor)
+    if serialize.FAST_JSON:
+        return serialize.json_response(serialize.item_dicts(items), response)
+    return items
 
 @app.post("/api/items/{item_id}/purchase")
+@retry_on_locked
+@db_endpoint
 def purchase_item(item_id: int, db: Session = Depends(get_db)):
-    item = db.query(models.Item).filter(models.Item.id == item_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    
-    item.purchased = not item.purchased  # Toggle the purchased state
-    item.purchase_date = datetime.utcnow() if item.purchased else None  # Set or clear purchase date
-    
-    db.commit()
-    return {"status": "success"}
+    def toggle(db):
+        # Toggle in one statement so concurrent clicks can't cancel each other out
+        stmt = (
+            update(models.Item)
+            .where(models.Item.id == item_id)
+            .values(
+                purchased=~models.Item.purchased,
+                purchase_date=case((models.Item.purchased, None), else_=datetime.utcnow()),
+                version=models.Item.version + 1,
+            )
+            .returning(*models.Item.__table__.columns)
+            .execution_options(synchronize_session=False)
+        )
+        row = db.execute(stmt).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return dict(row), revisions.bump_revision(db, [("item", item_id)])
+
+    row, revision = write_queue.run_write(db, toggle)
+    response_cache.invalidate(revision, [wishlist_scope(row["wishlist_id"])])
+    events.hub.publish("item.updated", row, revision, [row["wishlist_id"]])
+    return {"status": "success", "purchased": row["purchased"]}
+
+@app.put("/api/items/{item_id}/purchased", response_model=schemas.Item)
+@retry_on_locked
+@db_endpoint
+def set_item_purchased(
+    item_id: int,
+    purchase: schemas.PurchaseUpdate,
+    db: Session = Depends(get_db)
+):
+    # Conditional UPDATE: only applies if the item is still in the opposite
+    # state (and at the version the client saw), so a lost race is detected
+    # instead of silently undoing someone else's change
+    conditions = [models.Item.id == item_id, models.Item.purchased == (not purchase.purchased)]
+    if purchase.version is not None:
+        conditions.append(models.Item.version == purchase.version)
+
+    def set_purchased(db):
+        stmt = (
+            update(models.Item)
+            .where(*conditions)
+            .values(
+                purchased=purchase.purchased,
+                purchase_date=datetime.utcnow() if purchase.purchased else None,
+                version=models.Item.version + 1,
+            )
+            .returning(*models.Item.__table__.columns)
+            .execution_options(synchronize_session=False)
+        )
+        row = db.execute(stmt).mappings().first()
+        if row is None:
+            # Nothing was written, so the current state is what the client lost to
+            current = db.get(models.Item, item_id)
+            if current is None:
+                raise HTTPException(status_code=404, detail="Item not found")
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "message": "Item was changed by someone else",
+                    "item": jsonable_encoder(schemas.Item.model_validate(current)),
+                },
+            )
+        return dict(row), revisions.bump_revision(db, [("item", item_id)])
+
+    row, revision = write_queue.run_write(db, set_purchased)
+    response_cache.invalidate(revision, [wishlist_scope(row["wishlist_id"])])
+    events.hub.publish("item.updated", row, revision, [row["wishlist_id"]])
+    return row
 
 @app.delete("/api/items/{item_id}")
+@retry_on_locked
+@db_endpoint
 def delete_item(
     item_id: int,
     current_user: schemas.User = Depends(auth.get_current_user),
@@ -193,9 +562,91 @@ def delete_item(
         raise HTTPException(status_code=403, detail="Not authorized to delete this item")
     
     db.delete(item)
+    revision = revisions.bump_revision(db, [("item", item_id)])
     db.commit()
+    response_cache.invalidate(revision, [wishlist_scope(wishlist.id)])
+    events.hub.publish("item.deleted", {"id": item_id, "wishlist_id": wishlist.id}, revision, [wishlist.id])
     return {"message": "Item deleted"}
 
+@app.get("/api/search/items", response_model=list[schemas.Item])
+@db_endpoint
+def search_items(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    wishlist_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    # Ranked full-text search; every word in q matches as a prefix
+    items, next_cursor = search.search(db, models.Item, q, cursor, limit, {"wishlist_id": wishlist_id})
+    pagination.set_next_cursor(response, next_cursor)
+    return items
+
+@app.get("/api/search/wishlists", response_model=list[schemas.WishlistSummary])
+@db_endpoint
+def search_wishlists(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    wishlists, next_cursor = search.search(db, models.Wishlist, q, cursor, limit)
+    pagination.set_next_cursor(response, next_cursor)
+    return wishlists
+
+@app.get("/api/changes", response_model=schemas.ChangeSet)
+@db_endpoint
+def get_changes(
+    since: int = Query(..., ge=0),
+    limit: int = Query(MAX_CHANGES, ge=1, le=MAX_CHANGES),
+    db: Session = Depends(get_db)
+):
+    # Delta sync: everything created, modified or deleted after revision
+    # `since`. Rows touched more than once are returned once, in their
+    # current state; a row that no longer exists is reported as deleted.
+    changed = revisions.changed_since(db, since, limit)
+    if changed is None:
+        revision, _ = revisions.current_revision(db)
+        return {"revision": revision, "reset": True}
+
+    revision, ids = changed
+    wishlists, items = [], []
+    if ids["wishlist"]:
+        wishlists = db.query(models.Wishlist).filter(models.Wishlist.id.in_(ids["wishlist"])).all()
+    if ids["item"]:
+        items = db.query(models.Item).filter(models.Item.id.in_(ids["item"])).all()
+    return {
+        "revision": revision,
+        "wishlists": wishlists,
+        "items": items,
+        "deleted_wishlists": sorted(ids["wishlist"] - {w.id for w in wishlists}),
+        "deleted_items": sorted(ids["item"] - {i.id for i in items}),
+    }
+
+@app.get("/api/events")
+async def event_stream(wishlist_id: Optional[int] = None):
+    # Server-sent events: incremental changes instead of refetching everything
+    return StreamingResponse(
+        events.hub.stream(wishlist_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/export")
+def export_dataset(include_hashes: bool = False, _: None = Depends(auth.require_admin)):
+    # Streams straight from a Core cursor; nothing is buffered per request
+    def stream():
+        with database.engine.connect() as conn:
+            yield from transfer.export_lines(conn, include_hashes=include_hashes)
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=wishlists.ndjson"},
+    )
+
 if __name__ == "__main__":
     import uvicorn
     import os
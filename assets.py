@@ -0,0 +1,209 @@
+"""Static asset pipeline: vendored libraries, content-hashed names, precompression.
+
+    python assets.py vendor         # fetch third-party files into static/vendor/ (commit them)
+    python assets.py build          # write static/dist/ and its manifest.json
+    python assets.py vendor build   # both, in order
+
+build copies every .js and .css under static/ to static/dist/ with a content
+hash in its name (viewer.3f2a9c1d0b.js), next to .gz and, when the brotli
+package is installed, .br variants. Templates link assets through
+asset_url(), which looks names up in the manifest, so a changed file gets a
+new URL and every hashed URL can be cached forever. Pages never load from a
+CDN: build refuses to run while a vendored file is missing, and serve.py
+and gunicorn.conf.py call prepare(), which downloads missing ones first and
+stops the server from starting if it can't. Without a build (e.g.
+`python app.py` in development) asset_url() links the plain files.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+import urllib.request
+from typing import Dict
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are built without it
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+STATIC_URL = "/static/"
+
+# Local name under static/ -> where `vendor` downloads it from
+VENDOR = {
+    "vendor/bootstrap.min.css": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css",
+    "vendor/bootstrap.bundle.min.js": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js",
+    "vendor/tailwindcss.js": "https://cdn.tailwindcss.com",
+}
+
+ASSET_SUFFIXES = (".js", ".css")
+HASH_LENGTH = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Variants in order of preference, by Accept-Encoding token
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _load_manifest() -> Dict[str, str]:
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+manifest = _load_manifest()
+
+
+def asset_url(name: str) -> str:
+    """URL for a file under static/, hashed if the build has run."""
+    if name in manifest:
+        return f"{STATIC_URL}dist/{manifest[name]}"
+    return STATIC_URL + name
+
+
+def missing_vendor() -> list:
+    return [name for name in VENDOR if not os.path.exists(os.path.join(STATIC_DIR, name))]
+
+
+def vendor(names=None) -> None:
+    for name in VENDOR if names is None else names:
+        url = VENDOR[name]
+        path = os.path.join(STATIC_DIR, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                data = response.read()
+        except OSError as e:
+            raise RuntimeError(f"Could not download {name} from {url} ({e}); put it in static/{name} by hand") from e
+        with open(path, "wb") as f:
+            f.write(data)
+        print(f"{name}: {len(data)} bytes from {url}", file=sys.stderr)
+
+
+def _sources():
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+        for filename in files:
+            if filename.endswith(ASSET_SUFFIXES):
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, STATIC_DIR).replace(os.sep, "/"), path
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    stem, suffix = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{suffix}"
+
+
+def build() -> Dict[str, str]:
+    """Rebuild static/dist/ and return the new manifest.
+
+    Files from the previous build are kept, so pages rendered (or cached)
+    before a restart can still load their assets; older ones are removed.
+    """
+    missing = missing_vendor()
+    if missing:
+        raise RuntimeError(f"Missing vendored assets: {', '.join(missing)}; run `python assets.py vendor`")
+    previous = _load_manifest()
+    new_manifest = {}
+    for name, path in sorted(_sources()):
+        with open(path, "rb") as f:
+            data = f.read()
+        target = hashed_name(name, data)
+        out = os.path.join(DIST_DIR, target)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        with open(out, "wb") as f:
+            f.write(data)
+        # mtime=0 keeps the output identical between builds
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data):
+                with open(out + suffix, "wb") as f:
+                    f.write(compressed)
+        new_manifest[name] = target
+        sizes = ", ".join(f"{suffix[1:]} {len(c)}" for suffix, c in variants.items())
+        print(f"{name} -> dist/{target} ({len(data)} bytes; {sizes})", file=sys.stderr)
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(new_manifest, f, indent=2, sort_keys=True)
+    keep = {"manifest.json"} | set(previous.values()) | set(new_manifest.values())
+    for root, _, files in os.walk(DIST_DIR):
+        for filename in files:
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, DIST_DIR).replace(os.sep, "/")
+            if name.removesuffix(".gz").removesuffix(".br") not in keep:
+                os.remove(path)
+    manifest.clear()
+    manifest.update(new_manifest)
+    return new_manifest
+
+
+def prepare() -> None:
+    """Vendor whatever is missing, then build; run before serving."""
+    missing = missing_vendor()
+    if missing:
+        vendor(missing)
+    build()
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        quality = params.strip().replace(" ", "")
+        try:
+            if quality.startswith("q=") and float(quality[2:]) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles that serves dist/ precompressed and cacheable forever.
+
+    Hashed files never change under the same name, so they get an immutable
+    Cache-Control, and the smallest variant the client accepts is sent with
+    the matching Content-Encoding. Everything else is served as before.
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        if not path.startswith("dist/") or path.endswith((".gz", ".br")):
+            return await super().get_response(path, scope)
+
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        response = None
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted:
+                try:
+                    response = await super().get_response(path + suffix, scope)
+                except HTTPException:
+                    continue  # not worth compressing, or not built
+                response.headers["Content-Encoding"] = encoding
+                break
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+if __name__ == "__main__":
+    commands = {"vendor": vendor, "build": build}
+    if len(sys.argv) < 2 or not set(sys.argv[1:]) <= set(commands):
+        raise SystemExit(f"Usage: python assets.py {{{'|'.join(commands)}}}...")
+    try:
+        for command in sys.argv[1:]:
+            commands[command]()
+    except RuntimeError as e:
+        raise SystemExit(str(e))
@@ -1,14 +1,22 @@
 import os
+import asyncio
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-import bcrypt
 from fastapi import Depends, HTTPException, status, Cookie, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from typing import NamedTuple
+import bus
+import metrics
 import models
 import schemas
-from database import get_db
+from cache import LRUCache
+from database import get_db, run_db
 import logging
 
 # Set up logging with more detail
@@ -23,9 +31,85 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-keep-it-secret")  # Use en
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # Extended to 24 hours for better user experience
 
+# Shared secret for whole-dataset operations such as /api/export; unset disables them
+ADMIN_TOKEN = os.getenv("WISHLIST_ADMIN_TOKEN")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
+# Password hashing configuration
+BCRYPT_ROUNDS = int(os.getenv("WISHLIST_BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("WISHLIST_PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+# How many password jobs may wait for a free worker before new ones are rejected
+PASSWORD_QUEUE_LIMIT = int(os.getenv("WISHLIST_PASSWORD_QUEUE_LIMIT", str(PASSWORD_WORKERS * 4)))
+
+# bcrypt releases the GIL, so a thread pool gives real parallelism here
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE_LIMIT)
+
+# Authenticated-principal cache: token -> decoded claims + user snapshot
+AUTH_CACHE_SIZE = int(os.getenv("WISHLIST_AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL = float(os.getenv("WISHLIST_AUTH_CACHE_TTL", "60"))
+
+class Principal(NamedTuple):
+    claims: dict
+    user: schemas.User
+
+principal_cache = LRUCache(max_size=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+def invalidate_user(user_id: Optional[int], relay: bool = True) -> None:
+    """Forget every cached token that resolves to the given user (None: any user), in every worker."""
+    dropped = principal_cache.delete_where(lambda _, principal: user_id is None or principal.user.id == user_id)
+    if dropped:
+        logger.info(f"Invalidated {dropped} cached token(s) for user id: {user_id}")
+    if relay:
+        bus.send("auth", {"user_id": user_id})
+
+bus.register("auth", lambda message: invalidate_user(message["user_id"], relay=False))
+
+# Changed users are collected per session and only forgotten once the
+# transaction commits: invalidating at flush time would let a concurrent
+# request re-cache the old, still committed row. Code that updates users on
+# a bare Connection must call invalidate_user() after its commit itself.
+_CHANGED_USERS = "auth.changed_users"
+
+def _user_changed(session: Optional[Session], user_id: Optional[int]) -> None:
+    if session is not None:
+        session.info.setdefault(_CHANGED_USERS, set()).add(user_id)
+
+@event.listens_for(models.User, "after_update")
+def _user_updated(mapper, connection, target):
+    _user_changed(object_session(target), target.id)
+
+@event.listens_for(models.User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    _user_changed(object_session(target), target.id)
+
+@event.listens_for(Session, "do_orm_execute")
+def _users_statement(orm_execute_state):
+    # update()/delete() statements bypass the mapper events; which rows they
+    # hit isn't known, so every user is invalidated
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if getattr(table, "name", None) == models.User.__tablename__:
+            _user_changed(orm_execute_state.session, None)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    changed = session.info.pop(_CHANGED_USERS, None)
+    if changed:
+        for user_id in [None] if None in changed else changed:
+            invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session):
+    session.info.pop(_CHANGED_USERS, None)
+
+# jose (with its cryptography backends) and bcrypt are imported where they
+# are used, so they don't add to every worker's startup time
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    import bcrypt
+
     try:
         return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
     except Exception as e:
@@ -33,8 +117,10 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return False
 
 def get_password_hash(password: str) -> str:
+    import bcrypt
+
     try:
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
         return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
     except Exception as e:
         logger.error(f"Password hashing error: {str(e)}")
@@ -43,7 +129,39 @@ def get_password_hash(password: str) -> str:
             detail="Error processing password"
         )
 
+async def run_password_task(func, *args):
+    """Run a bcrypt call on the password pool without blocking the event loop.
+
+    Fails fast with 503 when every worker is busy and the queue is full, so a
+    burst of logins or registrations can't pile up behind each other.
+    """
+    if not _password_slots.acquire(blocking=False):
+        logger.warning("Password worker pool saturated, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"},
+        )
+    def timed():
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            metrics.bcrypt_seconds.observe(time.perf_counter() - started, func.__name__)
+
+    try:
+        future = _password_executor.submit(timed)
+    except Exception:
+        _password_slots.release()
+        raise
+    # Release on completion rather than on await, so a cancelled request
+    # still holds its slot until the worker is actually free again
+    future.add_done_callback(lambda _: _password_slots.release())
+    return await asyncio.wrap_future(future)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    from jose import jwt
+
     try:
         to_encode = data.copy()
         if expires_delta:
@@ -61,9 +179,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
             detail="Error creating access token"
         )
 
-def create_user(db: Session, user: schemas.UserCreate) -> models.User:
+def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
+    return db.query(models.User).filter(models.User.username == username).first()
+
+def _insert_user(db: Session, db_user: models.User) -> models.User:
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+async def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     try:
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await run_password_task(get_password_hash, user.password)
         db_user = models.User(
             username=user.username,
             email=user.email,
@@ -71,35 +198,38 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
             created_at=datetime.utcnow(),
             is_active=True
         )
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        db_user = await run_db(db, _insert_user, db_user)
         logger.info(f"Created new user: {user.username}")
         return db_user
+    except HTTPException:
+        await run_db(db, Session.rollback)
+        raise
     except Exception as e:
         logger.error(f"User creation error: {str(e)}")
-        db.rollback()
+        await run_db(db, Session.rollback)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error creating user"
         )
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
     try:
-        user = db.query(models.User).filter(models.User.username == username).first()
+        user = await run_db(db, get_user_by_username, username)
         if not user:
             logger.warning(f"Login attempt failed: User not found - {username}")
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await run_password_task(verify_password, password, user.hashed_password):
             logger.warning(f"Login attempt failed: Invalid password for user - {username}")
             return None
         logger.info(f"User authenticated successfully: {username}")
         return user
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
         return None
 
-async def get_current_user(request: Request, db: Session = Depends(get_db)) -> models.User:
+async def get_current_user(request: Request, db: Session = Depends(get_db)) -> schemas.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -110,13 +240,20 @@ async def get_current_user(request: Request, db: Session = Depends(get_db)) -> m
         # Get token from cookie
         auth_cookie = request.cookies.get("access_token")
         if not auth_cookie:
-            logger.error("No auth cookie found in request")
+            # Anonymous viewers hit this on every page; not worth a log line
             raise credentials_exception
         
         # Remove 'Bearer ' prefix if present
         token = auth_cookie.replace("Bearer ", "") if auth_cookie.startswith("Bearer ") else auth_cookie
         logger.debug("Processing token from cookie")
+
+        # Repeat requests with a known token skip signature checks and the user lookup
+        principal = principal_cache.get(token)
+        if principal is not None:
+            return principal.user
         
+        from jose import JWTError, jwt
+
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             username: str = payload.get("sub")
@@ -134,7 +271,7 @@ async def get_current_user(request: Request, db: Session = Depends(get_db)) -> m
             logger.error(f"JWT decode error: {str(e)}")
             raise credentials_exception
             
-        user = db.query(models.User).filter(models.User.username == username).first()
+        user = await run_db(db, get_user_by_username, username)
         if user is None:
             logger.error(f"No user found in database for username: {username}")
             raise credentials_exception
@@ -143,13 +280,24 @@ async def get_current_user(request: Request, db: Session = Depends(get_db)) -> m
             logger.error(f"User is not active: {username}")
             raise credentials_exception
             
-        logger.info(f"Successfully authenticated user: {username}")
-        return user
+        current_user = schemas.User.model_validate(user)
+        # Never cache a token past its own expiry
+        principal_cache.set(token, Principal(payload, current_user), ttl=exp - time.time())
+        logger.debug(f"Successfully authenticated user: {username}")
+        return current_user
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in get_current_user: {str(e)}")
         raise credentials_exception
 
+def require_admin(request: Request) -> None:
+    supplied = request.headers.get("Authorization", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(supplied, f"Bearer {ADMIN_TOKEN}"):
+        logger.warning("Rejected admin request without a valid admin token")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
 async def get_current_active_user(current_user = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -0,0 +1,344 @@
+"""Hot backups of the SQLite database: compressed, verified snapshots and restore.
+
+    python backup.py snapshot [--label before-upgrade]
+    python backup.py schedule          # a snapshot every WISHLIST_BACKUP_INTERVAL seconds
+    python backup.py list
+    python backup.py verify <snapshot>
+    python backup.py restore <snapshot>
+
+Copying data/wishlists.db while the app runs can tear: pages of the main
+file and the WAL are read at different moments. Snapshots are taken with
+SQLite's online backup API instead, a few hundred pages per step with a
+pause after each, so the app's requests keep getting the disk and the
+write lock between steps. The copy reads from one pinned read transaction,
+so it is a consistent point in time and writers committing meanwhile don't
+make it start over.
+
+Each snapshot is integrity-checked, gzipped and written next to a .json
+file with its checksum, size and dataset revision. Old snapshots are
+pruned: the newest WISHLIST_BACKUP_KEEP, plus the newest of each of the
+last WISHLIST_BACKUP_KEEP_DAILY days, are kept.
+
+restore copies a verified snapshot into the live database with the same
+API, so running workers keep their connections and see the restored data
+on their next query. A snapshot of the current state is taken first. It
+then writes a marker file next to the database, which each running worker
+polls to drop its cached pages and sign-ins and make live viewers reload.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from database import DATA_DIR, DB_PATH
+
+BACKUP_DIR = os.getenv("WISHLIST_BACKUP_DIR", os.path.join(DATA_DIR, "backups"))
+# Seconds between snapshots for `schedule`
+BACKUP_INTERVAL = float(os.getenv("WISHLIST_BACKUP_INTERVAL", "3600"))
+BACKUP_KEEP = int(os.getenv("WISHLIST_BACKUP_KEEP", "24"))
+BACKUP_KEEP_DAILY = int(os.getenv("WISHLIST_BACKUP_KEEP_DAILY", "7"))
+# Pages copied per backup step (4 KiB each by default) and the pause after each
+BACKUP_STEP_PAGES = int(os.getenv("WISHLIST_BACKUP_STEP_PAGES", "256"))
+BACKUP_PAUSE_MS = float(os.getenv("WISHLIST_BACKUP_PAUSE_MS", "10"))
+# CPU priority of `snapshot` and `schedule` (added to the process niceness):
+# compressing and checking a copy must not take the CPU from the app
+BACKUP_NICE = int(os.getenv("WISHLIST_BACKUP_NICE", "10"))
+
+SUFFIX = ".db.gz"
+# The UTC timestamp in snapshot names; group 1 is the day
+_STAMP = re.compile(r"-(\d{8})T\d{12}Z")
+BUSY_TIMEOUT_MS = 5000
+CHUNK_SIZE = 1024 * 1024
+# Rewritten by every restore; see restore_marker()
+RESTORE_MARKER = f"{DB_PATH}.restored"
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    # isolation_level=None: transactions are only the ones started here
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def integrity_check(path: str) -> List[str]:
+    """Problems PRAGMA integrity_check finds in an uncompressed database; empty if sound."""
+    conn = _connect(path)
+    try:
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    return [] if problems == ["ok"] else problems
+
+
+def _revision(conn: sqlite3.Connection) -> Optional[int]:
+    try:
+        row = conn.execute("SELECT revision FROM dataset_revision WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None  # a database from before revisions existed
+    return row[0] if row else 0
+
+
+def copy_database(source: str, target: str, pages: int = BACKUP_STEP_PAGES, pause: float = BACKUP_PAUSE_MS / 1000) -> dict:
+    """Copy `source` into the file `target` in steps; returns page count, revision and duration."""
+    started = time.perf_counter()
+    src = _connect(source)
+    dst = _connect(target)
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if remaining and pause > 0:
+            time.sleep(pause)  # sleeps without the GIL or any SQLite lock held
+
+    try:
+        # Pin a read transaction: every step then copies from the same
+        # snapshot, and commits by other connections can't restart the copy
+        src.execute("BEGIN")
+        revision = _revision(src)
+        src.backup(dst, pages=pages, progress=progress)
+        src.execute("COMMIT")
+        page_count = dst.execute("PRAGMA page_count").fetchone()[0]
+        # A self-contained file: the copy inherits WAL mode from the source
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        src.close()
+        dst.close()
+    return {"pages": page_count, "steps": steps, "revision": revision, "seconds": time.perf_counter() - started}
+
+
+def _snapshot_name(label: Optional[str]) -> str:
+    stem = os.path.splitext(os.path.basename(DB_PATH))[0]
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    suffix = f"-{''.join(c if c.isalnum() else '-' for c in label)}" if label else ""
+    return f"{stem}-{stamp}{suffix}{SUFFIX}"
+
+
+def snapshot(label: Optional[str] = None, directory: str = BACKUP_DIR, pages: int = BACKUP_STEP_PAGES,
+             pause: float = BACKUP_PAUSE_MS / 1000) -> str:
+    """Take a verified, compressed snapshot of the live database; returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _snapshot_name(label))
+    raw = path[: -len(".gz")] + ".tmp"
+    try:
+        copied = copy_database(DB_PATH, raw, pages, pause)
+        problems = integrity_check(raw)
+        if problems:
+            raise RuntimeError(f"Snapshot failed its integrity check: {problems[:5]}")
+        size = os.path.getsize(raw)
+        with open(raw, "rb") as src, gzip.open(path + ".tmp", "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        os.replace(path + ".tmp", path)
+    finally:
+        for leftover in (raw, path + ".tmp"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    meta = {
+        "file": os.path.basename(path),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "label": label,
+        "source": DB_PATH,
+        "revision": copied["revision"],
+        "pages": copied["pages"],
+        "bytes": size,
+        "compressed_bytes": os.path.getsize(path),
+        "sha256": _sha256(path),
+        "integrity": "ok",
+        "copy_seconds": round(copied["seconds"], 3),
+    }
+    with open(path[: -len(SUFFIX)] + ".json", "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Snapshot {path}: revision {meta['revision']}, {size} bytes ({meta['compressed_bytes']} compressed), "
+          f"copied in {meta['copy_seconds']} s", file=sys.stderr)
+    return path
+
+
+def _metadata(path: str) -> dict:
+    try:
+        with open(path[: -len(SUFFIX)] + ".json") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"file": os.path.basename(path)}
+
+
+def snapshots(directory: str = BACKUP_DIR) -> List[str]:
+    """Snapshot paths, oldest first (names carry a UTC timestamp after the database name)."""
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(SUFFIX)]
+
+
+def prune(directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP, keep_daily: int = BACKUP_KEEP_DAILY) -> List[str]:
+    """Delete snapshots outside the retention policy; returns the deleted paths."""
+    paths = snapshots(directory)
+    kept = set(paths[-keep:]) if keep > 0 else set()
+    newest_per_day = {}
+    for path in paths:
+        match = _STAMP.search(os.path.basename(path))
+        if match:
+            newest_per_day[match.group(1)] = path
+    kept.update(newest_per_day[day] for day in sorted(newest_per_day)[-keep_daily:] if keep_daily > 0)
+    deleted = []
+    for path in paths:
+        if path not in kept:
+            for leftover in (path, path[: -len(SUFFIX)] + ".json"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            deleted.append(path)
+    return deleted
+
+
+def _decompress(path: str, target: str) -> None:
+    with gzip.open(path, "rb") as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def verify(path: str) -> List[str]:
+    """Check a snapshot's checksum and integrity; returns the problems found."""
+    expected = _metadata(path).get("sha256")
+    if expected and _sha256(path) != expected:
+        return ["checksum mismatch"]
+    raw = path + ".verify"
+    try:
+        _decompress(path, raw)
+        return integrity_check(raw)
+    except (OSError, EOFError, sqlite3.DatabaseError) as e:
+        return [str(e)]
+    finally:
+        if os.path.exists(raw):
+            os.remove(raw)
+
+
+def restore_marker() -> Optional[dict]:
+    """The last restore into DB_PATH ({"revision", "snapshot", "restored_at"}), or None."""
+    try:
+        with open(RESTORE_MARKER) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def restore(path: str) -> int:
+    """Replace the live database's contents with a snapshot; returns the new revision."""
+    import database
+    import revisions
+
+    problems = verify(path)
+    if problems:
+        raise RuntimeError(f"Not restoring {path}: {problems[:5]}")
+    before = snapshot(label="pre-restore")
+    print(f"Current state saved as {before}", file=sys.stderr)
+
+    raw = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), f".restore-{os.getpid()}.db")
+    try:
+        _decompress(path, raw)
+        src = _connect(raw)
+        dst = _connect(DB_PATH)
+        try:
+            live_revision = _revision(dst) or 0
+            # One step: the destination is swapped atomically under its write
+            # lock, so readers see either the old or the restored database
+            src.backup(dst)
+            restored_revision = _revision(dst) or 0
+        finally:
+            src.close()
+            dst.close()
+    finally:
+        if os.path.exists(raw):
+            os.remove(raw)
+
+    # An older snapshot may need migrating to the schema of this code
+    database.init_db()
+    # Revisions must keep increasing, and clients' delta-sync baselines
+    # describe the replaced data; jumping past the change-log retention
+    # makes every one of them reload in full
+    revision = max(live_revision, restored_revision) + revisions.CHANGE_LOG_RETENTION + 1
+    with database.engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM change_log")
+        conn.exec_driver_sql(
+            "INSERT INTO dataset_revision (id, revision, updated_at) VALUES (1, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET revision = excluded.revision, updated_at = excluded.updated_at",
+            (revision, datetime.utcnow()),
+        )
+    # Running workers poll this, however many there are and whether or not
+    # the bus is on, and drop what they cached from the replaced data
+    marker = {"revision": revision, "snapshot": os.path.abspath(path), "restored_at": datetime.utcnow().isoformat()}
+    tmp_path = f"{RESTORE_MARKER}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(marker, f)
+    os.replace(tmp_path, RESTORE_MARKER)
+    print(f"Restored {path} (revision {restored_revision}) into {DB_PATH}; now at revision {revision}", file=sys.stderr)
+    return revision
+
+
+def schedule(interval: float = BACKUP_INTERVAL) -> None:
+    while True:
+        started = time.monotonic()
+        try:
+            snapshot()
+            for path in prune():
+                print(f"Pruned {path}", file=sys.stderr)
+        except Exception as e:
+            # Keep the schedule going; the next run may well succeed
+            print(f"Snapshot failed: {e}", file=sys.stderr)
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot_cmd = commands.add_parser("snapshot", help="Take one snapshot and prune old ones")
+    snapshot_cmd.add_argument("--label", help="Appended to the file name, e.g. before-upgrade")
+    snapshot_cmd.add_argument("--pages", type=int, default=BACKUP_STEP_PAGES, help="Pages per step, -1 for one step")
+    snapshot_cmd.add_argument("--pause-ms", type=float, default=BACKUP_PAUSE_MS, help="Pause after each step")
+    schedule_cmd = commands.add_parser("schedule", help="Take snapshots forever")
+    schedule_cmd.add_argument("--interval", type=float, default=BACKUP_INTERVAL, help="Seconds between snapshots")
+    commands.add_parser("list", help="List snapshots, oldest first")
+    verify_cmd = commands.add_parser("verify", help="Check a snapshot's checksum and integrity")
+    verify_cmd.add_argument("snapshot")
+    restore_cmd = commands.add_parser("restore", help="Restore a snapshot into the live database")
+    restore_cmd.add_argument("snapshot")
+    args = parser.parse_args()
+
+    if args.command in ("snapshot", "schedule") and BACKUP_NICE:
+        os.nice(BACKUP_NICE)
+    if args.command == "snapshot":
+        print(snapshot(args.label, pages=args.pages, pause=args.pause_ms / 1000))
+        for path in prune():
+            print(f"Pruned {path}", file=sys.stderr)
+    elif args.command == "schedule":
+        schedule(args.interval)
+    elif args.command == "list":
+        for path in snapshots():
+            meta = _metadata(path)
+            print(f"{meta['file']}  revision {meta.get('revision')}  {meta.get('compressed_bytes', os.path.getsize(path))} bytes"
+                  f"{'  ' + meta['label'] if meta.get('label') else ''}")
+    elif args.command == "verify":
+        problems = verify(args.snapshot)
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        print("ok" if not problems else "FAILED")
+        sys.exit(1 if problems else 0)
+    elif args.command == "restore":
+        restore(args.snapshot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Foreground latency while a hot snapshot of the database is taken.
+
+Concurrent clients read wishlist pages and toggle purchases through the app
+in-process while `backup.py snapshot` runs as a separate process, as it
+would in production:
+
+    no_backup    the workload alone, for a baseline
+    one_step     the whole database copied in a single backup step
+    incremental  WISHLIST_BACKUP_STEP_PAGES pages per step with a pause after each
+
+Reports read and write latency percentiles during the snapshot and how long
+the snapshot took. The response cache is off so reads hit the database.
+
+Usage:
+    python -m benchmarks.backup --users 1000 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["WISHLIST_DB_PATH"] = os.path.join(_tmp.name, "bench.db")
+os.environ["WISHLIST_BACKUP_DIR"] = os.path.join(_tmp.name, "backups")
+os.environ["WISHLIST_RESPONSE_CACHE"] = "off"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def run_load(client, item_range, concurrency: int, until, read_share: float) -> dict:
+    latencies = {"read": [], "write": []}
+
+    async def worker(n: int):
+        rng = random.Random(n)
+        while not until():
+            started = time.perf_counter()
+            if rng.random() < read_share:
+                await client.get("/api/wishlists", params={"limit": 50})
+                kind = "read"
+            else:
+                await client.post(f"/api/items/{rng.randint(*item_range)}/purchase")
+                kind = "write"
+            latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    result = {}
+    for kind, values in latencies.items():
+        values.sort()
+        if values:
+            result[f"{kind}_p50_ms"] = round(values[len(values) // 2], 2)
+            result[f"{kind}_p99_ms"] = round(values[int(len(values) * 0.99)], 2)
+            result[f"{kind}_max_ms"] = round(values[-1], 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="Seeded users, 4 wishlists of 25 items each")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--read-share", type=float, default=0.8)
+    parser.add_argument("--baseline-seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    import httpx
+
+    import app
+    import create_test_data
+    import database
+
+    database.init_db()
+    create_test_data.seed_bulk(args.users, 4, 25, 0, 0)
+    database.engine.dispose()
+    size_mb = os.path.getsize(database.DB_PATH) / 1e6
+    with database.engine.connect() as conn:
+        item_range = conn.exec_driver_sql("SELECT min(id), max(id) FROM items").one()
+
+    modes = [
+        ("no_backup", None),
+        ("one_step", ["--pages", "-1", "--pause-ms", "0"]),
+        ("incremental", []),
+    ]
+
+    async def run():
+        results = []
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://bench") as client:
+            for mode, options in modes:
+                started = time.perf_counter()
+                if options is None:
+                    process = None
+                    until = lambda: time.perf_counter() - started >= args.baseline_seconds  # noqa: E731
+                else:
+                    process = subprocess.Popen(
+                        [sys.executable, "backup.py", "snapshot", *options],
+                        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                    )
+                    until = lambda: process.poll() is not None  # noqa: E731
+                result = await run_load(client, item_range, args.concurrency, until, args.read_share)
+                if process is not None:
+                    if process.returncode != 0:
+                        raise SystemExit(f"backup.py snapshot failed in mode {mode}")
+                    result["snapshot_seconds"] = round(time.perf_counter() - started, 2)
+                results.append({"mode": mode, "db_mb": round(size_mb, 1), **result})
+        return results
+
+    for result in asyncio.run(run()):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
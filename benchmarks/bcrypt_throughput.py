@@ -0,0 +1,49 @@
+"""Measure password verification (login) throughput per core.
+
+Usage:
+    python -m benchmarks.bcrypt_throughput --rounds 10 12 --workers 1 2 4
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+def measure(rounds: int, workers: int, jobs: int) -> dict:
+    password = b"correct horse battery staple"
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda _: bcrypt.checkpw(password, hashed), range(jobs)))
+    elapsed = time.perf_counter() - start
+
+    assert all(results)
+    throughput = jobs / elapsed
+    return {
+        "rounds": rounds,
+        "workers": workers,
+        "jobs": jobs,
+        "seconds": round(elapsed, 3),
+        "logins_per_sec": round(throughput, 2),
+        "logins_per_sec_per_core": round(throughput / min(workers, os.cpu_count() or 1), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--jobs", type=int, default=32, help="verifications per measurement")
+    args = parser.parse_args()
+
+    for rounds in args.rounds:
+        for workers in args.workers:
+            print(json.dumps(measure(rounds, workers, args.jobs)))
+
+
+if __name__ == "__main__":
+    main()
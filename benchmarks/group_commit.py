@@ -0,0 +1,131 @@
+"""Compare write throughput with and without the group-commit write queue.
+
+Concurrent clients toggle purchases and add items (the two mutations the
+queue handles) through the app in-process, first with a commit per request,
+then with WISHLIST_GROUP_COMMIT on. Reports writes/sec, latency and how many
+times a request or batch had to be retried because SQLite was locked.
+
+Usage:
+    python -m benchmarks.group_commit --writes 4000 --concurrency 32
+    python -m benchmarks.group_commit --synchronous FULL
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+class LockRetries(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record):
+        if "Database locked" in record.getMessage():
+            self.count += 1
+
+
+async def run_mode(client, data, writes: int, concurrency: int, create_share: float, seed: int) -> dict:
+    latencies = []
+    failures = 0
+    remaining = [writes]
+
+    async def worker(n: int):
+        nonlocal failures
+        rng = random.Random(seed * 1000 + n)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            started = time.perf_counter()
+            if rng.random() < create_share:
+                cookie, wishlist_ids = rng.choice(data.sessions)
+                response = await client.post(
+                    f"/api/wishlists/{rng.choice(wishlist_ids)}/items",
+                    json={"name": "Bench item", "link": "https://example.com/bench"},
+                    headers={"Cookie": cookie},
+                )
+            else:
+                response = await client.post(f"/api/items/{rng.randint(*data.item_range)}/purchase")
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "writes_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)], 2),
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=4000, help="Writes per mode")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--create-share", type=float, default=0.2, help="Fraction of writes that add an item")
+    parser.add_argument("--synchronous", default="NORMAL", help="SQLite synchronous pragma (NORMAL or FULL)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    # Must be set before the app's modules are imported
+    os.environ["WISHLIST_DB_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ["WISHLIST_SQLITE_SYNCHRONOUS"] = args.synchronous
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    import httpx
+
+    import app
+    import create_test_data
+    import database
+    import write_queue
+    from benchmarks.load import Dataset
+
+    database.init_db()
+    create_test_data.seed_bulk(50, 3, 20, 0, args.seed)
+    data = Dataset(database.engine, sessions=50)
+    retries = LockRetries()
+    logging.getLogger().addHandler(retries)
+
+    async def run():
+        results = []
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://bench") as client:
+            for group_commit in (False, True):
+                write_queue.GROUP_COMMIT = group_commit
+                retries.count = 0
+                batches, written = write_queue.writer.batches, write_queue.writer.writes
+                result = await run_mode(client, data, args.writes, args.concurrency, args.create_share, args.seed)
+                result["lock_retries"] = retries.count
+                if group_commit:
+                    committed = write_queue.writer.batches - batches
+                    result["commits"] = committed
+                    result["mean_batch"] = round((write_queue.writer.writes - written) / committed, 1)
+                else:
+                    result["commits"] = args.writes
+                results.append({"group_commit": group_commit, **result})
+        if database.async_engine is not None:
+            await database.async_engine.dispose()
+        return results
+
+    for result in asyncio.run(run()):
+        print(json.dumps({
+            "synchronous": args.synchronous,
+            "concurrency": args.concurrency,
+            "db_async": database.DB_ASYNC,
+            **result,
+        }))
+    sys.stdout.flush()
+    database.engine.dispose()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
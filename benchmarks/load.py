@@ -0,0 +1,267 @@
+"""Run a scripted mixed workload and report latency percentiles as JSON.
+
+Actions, picked at random by weight:
+    viewer    GET /viewer and the first page of /api/wishlists (anonymous)
+    purchase  POST /api/items/{id}/purchase on a random item
+    login     POST /login with a seeded user's password (bcrypt bound)
+    creator   add an item to one of the user's wishlists, then delete it
+
+By default a fresh database is seeded with create_test_data.seed_bulk and
+requests go through httpx's ASGI transport, in-process. With --base-url the
+same workload targets a running server; pass --db with the database that
+server uses (started with the same SECRET_KEY) so the harness can pick ids
+and mint session tokens.
+
+Usage:
+    python -m benchmarks.load --users 200 --duration 20 --concurrency 16
+    python -m benchmarks.load --mix viewer=90,purchase=10 --output before.json
+    python -m benchmarks.load --base-url http://localhost:8000 --db data/wishlists.db
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+
+DEFAULT_MIX = "viewer=70,purchase=20,login=5,creator=5"
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(ACTIONS)
+    if unknown:
+        raise SystemExit(f"Unknown actions in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    # Nearest-rank percentile
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(0, rank - 1)]
+
+
+class Dataset:
+    """Ids the workload draws from, read back from the database."""
+
+    def __init__(self, engine, sessions: int):
+        from sqlalchemy import func, select
+
+        import auth
+        import models
+
+        with engine.connect() as conn:
+            self.usernames = conn.execute(select(models.User.username).order_by(models.User.id)).scalars().all()
+            self.item_range = conn.execute(select(func.min(models.Item.id), func.max(models.Item.id))).one()
+            owned = conn.execute(
+                select(models.User.username, models.Wishlist.id)
+                .join(models.Wishlist, models.Wishlist.owner_id == models.User.id)
+                .where(models.User.username.in_(self.usernames[:sessions]))
+            ).all()
+        wishlists = defaultdict(list)
+        for username, wishlist_id in owned:
+            wishlists[username].append(wishlist_id)
+        # Pre-minted session cookies, so creator edits don't pay for a login
+        self.sessions = [
+            (f'access_token="Bearer {auth.create_access_token({"sub": username})}"', ids)
+            for username, ids in wishlists.items()
+        ]
+        if not self.usernames or self.item_range[0] is None or not self.sessions:
+            raise SystemExit("The database has no users, wishlists or items to run against")
+
+
+async def viewer(client, rng, data):
+    page = await client.get("/viewer")
+    wishlists = await client.get("/api/wishlists", params={"limit": 50})
+    return page.status_code < 400 and wishlists.status_code < 400
+
+
+async def purchase(client, rng, data):
+    response = await client.post(f"/api/items/{rng.randint(*data.item_range)}/purchase")
+    # Items deleted by earlier runs are fine
+    return response.status_code in (200, 404)
+
+
+async def login(client, rng, data):
+    from create_test_data import TEST_PASSWORD
+
+    response = await client.post("/login", data={"username": rng.choice(data.usernames), "password": TEST_PASSWORD})
+    # Keep the shared client anonymous for the other actions
+    client.cookies.clear()
+    return response.status_code == 303
+
+
+async def creator(client, rng, data):
+    cookie, wishlist_ids = rng.choice(data.sessions)
+    headers = {"Cookie": cookie}
+    created = await client.post(
+        f"/api/wishlists/{rng.choice(wishlist_ids)}/items",
+        json={"name": f"Bench item {rng.random():.6f}", "link": "https://example.com/bench"},
+        headers=headers,
+    )
+    if created.status_code != 200:
+        return False
+    deleted = await client.delete(f"/api/items/{created.json()['id']}", headers=headers)
+    return deleted.status_code == 200
+
+
+ACTIONS = {"viewer": viewer, "purchase": purchase, "login": login, "creator": creator}
+
+
+async def run_workload(client, data, weights: dict, concurrency: int, duration: float, requests: int, seed: int):
+    names = list(weights)
+    action_weights = list(weights.values())
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    remaining = [requests]
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int):
+        rng = random.Random(seed * 1000 + n)
+        while time.perf_counter() < deadline:
+            if requests:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            name = rng.choices(names, weights=action_weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = await ACTIONS[name](client, rng, data)
+            except Exception:
+                logging.getLogger(__name__).exception(f"{name} failed")
+                ok = False
+            samples[name].append((time.perf_counter() - started) * 1000)
+            if not ok:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return samples, errors, time.perf_counter() - started
+
+
+def summarize(samples: dict, errors: dict, elapsed: float) -> dict:
+    actions = {}
+    for name, values in sorted(samples.items()):
+        values.sort()
+        actions[name] = {
+            "count": len(values),
+            "errors": errors.get(name, 0),
+            "throughput_per_sec": round(len(values) / elapsed, 1),
+            "mean_ms": round(sum(values) / len(values), 2),
+            "p50_ms": round(percentile(values, 0.50), 2),
+            "p95_ms": round(percentile(values, 0.95), 2),
+            "p99_ms": round(percentile(values, 0.99), 2),
+        }
+    total = sum(len(v) for v in samples.values())
+    return {
+        "elapsed_sec": round(elapsed, 2),
+        "actions_total": total,
+        "errors_total": sum(errors.values()),
+        "throughput_per_sec": round(total / elapsed, 1) if elapsed else 0.0,
+        "actions": actions,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--db", help="Existing database to use (default: a fresh seeded one)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--wishlists", type=int, default=3, help="Wishlists per user")
+    parser.add_argument("--items", type=int, default=20, help="Items per wishlist")
+    parser.add_argument("--shares", type=int, default=1, help="Shares per wishlist")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Action weights (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many actions instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    weights = parse_mix(args.mix)
+
+    tmp = None
+    if args.db is None:
+        if args.base_url:
+            raise SystemExit("--base-url needs --db pointing at the server's database")
+        tmp = tempfile.TemporaryDirectory()
+        args.db = os.path.join(tmp.name, "bench.db")
+    # Must be set before the app's modules are imported
+    os.environ["WISHLIST_DB_PATH"] = args.db
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    import httpx
+
+    import create_test_data
+    import database
+
+    seeded = None
+    if tmp is not None:
+        database.init_db()
+        started = time.perf_counter()
+        create_test_data.seed_bulk(args.users, args.wishlists, args.items, args.shares, args.seed)
+        seeded = round(time.perf_counter() - started, 1)
+    data = Dataset(database.engine, sessions=min(50, args.users))
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://bench", timeout=60)
+
+    async def run():
+        async with client:
+            result = await run_workload(
+                client, data, weights, args.concurrency, args.duration, args.requests, args.seed
+            )
+        if database.async_engine is not None:
+            # The in-process app never sees a shutdown event
+            await database.async_engine.dispose()
+        return result
+    samples, errors, elapsed = asyncio.run(run())
+
+    report = {
+        "commit": git_commit(),
+        "target": args.base_url or "asgi",
+        "config": {
+            "users": len(data.usernames),
+            "items": data.item_range[1] - data.item_range[0] + 1,
+            "mix": weights,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "seed_sec": seeded,
+            "db_profile": database.DB_PROFILE,
+            "db_async": database.DB_ASYNC,
+        },
+        **summarize(samples, errors, elapsed),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    database.engine.dispose()
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
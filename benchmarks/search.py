@@ -0,0 +1,120 @@
+"""Compare FTS5 search with LIKE '%...%' scans over a large items table.
+
+Seeds a throwaway database with generated item names and links, then times
+the same queries through items_fts and through LIKE on the indexed name and
+link columns (which a leading wildcard can't use). Names draw on a large
+generated vocabulary, so most queries are selective like real searches; the
+broad ones match a tenth of the table or more and show the cost of
+ranking every match.
+
+Usage:
+    python -m benchmarks.search --items 1000000 --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, text
+
+import database
+import models
+import search
+
+NOUNS = ["oven", "kettle", "scarf", "boots", "lamp", "headphones", "puzzle", "blanket", "mug", "backpack"]
+SHOPS = ["amazon.com", "etsy.com", "rei.com", "target.com", "lecreuset.com"]
+VOCABULARY_SIZE = 50_000
+SEED_BATCH = 50_000
+
+
+def vocabulary(rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(VOCABULARY_SIZE)]
+
+
+def queries(words: list) -> list:
+    # Selective: a word, a two-word phrase, a prefix. Broad: a noun, a shop.
+    return [words[17], f"{words[17]} {words[4242]}", words[999][:4], "kettle", "lecreuset"]
+
+
+def seed(engine, items: int, words: list) -> None:
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{"username": "bench", "created_at": now}])
+        conn.execute(insert(models.Wishlist), [{"name": "Bench", "person": "Bench", "owner_id": 1, "created_at": now}])
+    for start in range(0, items, SEED_BATCH):
+        rows = []
+        for i in range(start, min(start + SEED_BATCH, items)):
+            name = f"{rng.choice(words)} {rng.choice(words)} {rng.choice(NOUNS)}"
+            link = f"https://{rng.choice(SHOPS)}/p/{i}"
+            rows.append({"name": name, "link": link, "wishlist_id": 1, "purchased": False, "created_at": now})
+        with engine.begin() as conn:
+            conn.execute(insert(models.Item), rows)
+
+
+def fts_query(conn, query: str, limit: int) -> list:
+    return conn.execute(
+        text(
+            "SELECT items.id FROM items_fts JOIN items ON items.id = items_fts.rowid "
+            "WHERE items_fts MATCH :match ORDER BY bm25(items_fts, 10.0, 1.0), items.id LIMIT :limit"
+        ),
+        {"match": search.match_expression(query), "limit": limit},
+    ).all()
+
+
+def like_query(conn, query: str, limit: int) -> list:
+    conditions, params = [], {"limit": limit}
+    for n, word in enumerate(query.split()):
+        conditions.append(f"(name LIKE :w{n} OR link LIKE :w{n})")
+        params[f"w{n}"] = f"%{word}%"
+    return conn.execute(
+        text(f"SELECT id FROM items WHERE {' AND '.join(conditions)} ORDER BY id LIMIT :limit"), params
+    ).all()
+
+
+def measure(conn, method, query: str, limit: int, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = method(conn, query, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "rows": len(rows),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = database.create_db_engine(os.path.join(tmp, "bench.db"))
+        database.Base.metadata.create_all(bind=engine)
+        search.create_search_index(engine)
+        started = time.perf_counter()
+        words = vocabulary(random.Random(7))
+        seed(engine, args.items, words)
+        search.rebuild(engine)
+        print(json.dumps({"items": args.items, "seed_seconds": round(time.perf_counter() - started, 1)}))
+
+        with engine.connect() as conn:
+            for query in queries(words):
+                for name, method in (("fts5", fts_query), ("like", like_query)):
+                    result = measure(conn, method, query, args.limit, args.repeat)
+                    print(json.dumps({"query": query, "method": name, **result}))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Compare requests/sec of the wishlist list endpoint per serialization path.
+
+    response_model  ORM objects returned to FastAPI: jsonable_encoder + json
+    pydantic        ORM objects validated by a TypeAdapter (WISHLIST_FAST_JSON=false)
+    fast            column tuples -> dicts -> orjson (the default)
+
+The response cache is switched off so every request does the full work.
+
+Usage:
+    python -m benchmarks.serialization --wishlists 200 --items 20 --requests 200
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["WISHLIST_DB_PATH"] = os.path.join(_tmp.name, "bench.db")
+os.environ["WISHLIST_RESPONSE_CACHE"] = "off"
+
+from datetime import datetime  # noqa: E402
+
+from fastapi import Depends  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import Session, selectinload  # noqa: E402
+
+import app as wishlist_app  # noqa: E402
+import database  # noqa: E402
+import models  # noqa: E402
+import schemas  # noqa: E402
+import serialize  # noqa: E402
+
+
+@wishlist_app.app.get(
+    "/bench/response-model", response_model=list[schemas.Wishlist], response_class=JSONResponse
+)
+def response_model_path(db: Session = Depends(database.get_sync_db)):
+    # GET /api/wishlists as it was before the fast path
+    return (
+        db.query(models.Wishlist)
+        .options(selectinload(models.Wishlist.items))
+        .order_by(models.Wishlist.created_at, models.Wishlist.id)
+        .all()
+    )
+
+
+def seed(wishlists: int, items: int) -> None:
+    database.init_db()
+    now = datetime.utcnow()
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [{"username": "bench", "created_at": now}])
+        conn.execute(insert(models.Wishlist), [
+            {"name": f"Wishlist {w}", "person": f"Person {w % 7}", "owner_id": 1, "created_at": now}
+            for w in range(wishlists)
+        ])
+        conn.execute(insert(models.Item), [
+            {
+                "name": f"Item {w}-{i}",
+                "link": f"https://example.com/{w}/{i}",
+                "wishlist_id": w + 1,
+                "purchased": i % 3 == 0,
+                "purchase_date": now if i % 3 == 0 else None,
+                "created_at": now,
+            }
+            for w in range(wishlists)
+            for i in range(items)
+        ])
+
+
+def measure(client: TestClient, url: str, requests: int) -> dict:
+    body = client.get(url).content  # warm up
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(url)
+    elapsed = time.perf_counter() - started
+    return {"requests_per_sec": round(requests / elapsed, 1), "bytes": len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wishlists", type=int, default=200)
+    parser.add_argument("--items", type=int, default=20, help="Items per wishlist")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    seed(args.wishlists, args.items)
+    client = TestClient(wishlist_app.app)
+
+    bodies = {}
+    for mode in ("response_model", "pydantic", "fast"):
+        serialize.FAST_JSON = mode == "fast"
+        url = "/bench/response-model" if mode == "response_model" else "/api/wishlists"
+        bodies[mode] = client.get(url).content
+        result = measure(client, url, args.requests)
+        print(json.dumps({"mode": mode, "wishlists": args.wishlists, "items_per_wishlist": args.items, **result}))
+    print(json.dumps({"identical_bodies": len(set(bodies.values())) == 1}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare concurrent write throughput of the legacy and production SQLite profiles.
+
+Each thread toggles random items' purchased flag in its own transaction,
+mirroring viewers clicking "Mark Purchased" at the same time.
+
+Usage:
+    python -m benchmarks.sqlite_writes --threads 16 --writes 200
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import database
+import models
+
+
+def run(profile: str, threads: int, writes: int, items: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = database.create_db_engine(os.path.join(tmp, "bench.db"), profile)
+        database.Base.metadata.create_all(bind=engine)
+        now = datetime.utcnow()
+        with engine.begin() as conn:
+            conn.execute(insert(models.User), [{"username": "bench", "created_at": now}])
+            conn.execute(insert(models.Wishlist), [{"name": "Bench", "person": "Bench", "owner_id": 1, "created_at": now}])
+            conn.execute(insert(models.Item), [
+                {"name": f"Item {i}", "wishlist_id": 1, "purchased": False, "created_at": now}
+                for i in range(items)
+            ])
+        Session = sessionmaker(bind=engine)
+
+        @database.retry_on_locked
+        def toggle(db, item_id):
+            # Read-then-write, like app.purchase_item
+            item = db.get(models.Item, item_id)
+            db.execute(update(models.Item).where(models.Item.id == item_id).values(purchased=not item.purchased))
+            db.commit()
+
+        failures = []
+
+        def worker():
+            with Session() as db:
+                for _ in range(writes):
+                    try:
+                        toggle(db, random.randint(1, items))
+                    except OperationalError:
+                        db.rollback()
+                        failures.append(1)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+
+    total = threads * writes
+    return {
+        "profile": profile,
+        "threads": threads,
+        "writes": total,
+        "failed": len(failures),
+        "seconds": round(elapsed, 3),
+        "writes_per_sec": round((total - len(failures)) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="writes per thread")
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--profiles", nargs="+", default=["legacy", "production"])
+    args = parser.parse_args()
+
+    for profile in args.profiles:
+        print(json.dumps(run(profile, args.threads, args.writes, args.items)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Measure worker cold start: process launch to the first successful response.
+
+Each run starts `uvicorn app:app` in a fresh process and polls /health
+until it answers 200, which is what a load balancer or autoscaler waits
+for. Separately, `import app` is timed in a fresh interpreter.
+
+    fresh_db      empty database: tables, indexes and search index are created
+    unstamped_db  existing database without a schema fingerprint, so every
+                  table is checked (what each start did before fingerprints)
+    stamped_db    existing database with a matching fingerprint: no DDL
+
+Usage:
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SCRIPT = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+INIT_SCRIPT = "import time, app; t = time.perf_counter(); app.init_db(); print(time.perf_counter() - t)"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_script(script: str, env: dict) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def time_first_response(env: dict, timeout: float = 60) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError(f"No response from the server within {timeout} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summary(seconds: list) -> dict:
+    seconds = sorted(s * 1000 for s in seconds)
+    return {"min_ms": round(seconds[0], 1), "median_ms": round(seconds[len(seconds) // 2], 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, "bench.db")
+    env = dict(os.environ, WISHLIST_DB_PATH=db_path)
+
+    print(json.dumps({"phase": "import_app", **summary([time_script(IMPORT_SCRIPT, env) for _ in range(args.runs)])}))
+
+    def remove_db():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    def unstamp():
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA user_version = 0")
+
+    modes = (("fresh_db", remove_db), ("unstamped_db", unstamp), ("stamped_db", None))
+    phases = (
+        ("init_db", lambda: time_script(INIT_SCRIPT, env)),
+        ("first_response", lambda: time_first_response(env)),
+    )
+    for phase, measure in phases:
+        for mode, prepare in modes:
+            runs = []
+            for _ in range(args.runs):
+                if prepare is not None:
+                    prepare()
+                runs.append(measure())
+            print(json.dumps({"phase": phase, "mode": mode, **summary(runs)}))
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
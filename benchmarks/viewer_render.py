@@ -0,0 +1,96 @@
+"""Time the server-rendered viewer with a cold and a warm fragment cache.
+
+    client_side  SSR off: the /viewer shell plus the /api/wishlists fetch
+    ssr_cold     every card rendered on every request (fragment cache cleared)
+    ssr_warm     nothing changed since the last render
+    ssr_one_write  an item is toggled before each request, so one card is stale
+
+The response cache is switched off so every request rebuilds the page.
+
+Usage:
+    python -m benchmarks.viewer_render --wishlists 1000 --items 10 --requests 50
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["WISHLIST_DB_PATH"] = os.path.join(_tmp.name, "bench.db")
+os.environ["WISHLIST_RESPONSE_CACHE"] = "off"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as wishlist_app  # noqa: E402
+import fragments  # noqa: E402
+from benchmarks.serialization import seed  # noqa: E402
+
+
+def measure(requests: int, request, before=None) -> dict:
+    request()  # warm up
+    latencies = []
+    size = 0
+    for n in range(requests):
+        if before is not None:
+            before(n)
+        started = time.perf_counter()
+        size = request()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "max_ms": round(latencies[-1], 2),
+        "bytes": size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wishlists", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=10, help="Items per wishlist")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    seed(args.wishlists, args.items)
+    fragments.fragment_cache.max_size = max(fragments.fragment_cache.max_size, args.wishlists)
+    client = TestClient(wishlist_app.app)
+
+    def viewer() -> int:
+        response = client.get("/viewer")
+        assert response.status_code == 200
+        return len(response.content)
+
+    def client_side() -> int:
+        return viewer() + len(client.get("/api/wishlists").content)
+
+    def clear(_):
+        fragments.fragment_cache.clear()
+
+    def toggle(n):
+        client.post(f"/api/items/{n * args.items % (args.wishlists * args.items) + 1}/purchase")
+
+    modes = [
+        ("client_side", False, client_side, None),
+        ("ssr_cold", True, viewer, clear),
+        ("ssr_warm", True, viewer, None),
+        ("ssr_one_write", True, viewer, toggle),
+    ]
+    for mode, ssr, request, before in modes:
+        fragments.VIEWER_SSR = ssr
+        misses = fragments.fragment_cache.misses
+        result = measure(args.requests, request, before)
+        print(json.dumps({
+            "mode": mode,
+            "wishlists": args.wishlists,
+            "items_per_wishlist": args.items,
+            **result,
+            "cards_rendered_per_request": round((fragments.fragment_cache.misses - misses) / (args.requests + 1), 1),
+        }))
+
+
+if __name__ == "__main__":
+    main()
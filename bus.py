@@ -0,0 +1,126 @@
+"""Broadcast invalidations and live events between worker processes.
+
+With several workers behind one port, each process has its own memory
+caches and SSE subscribers, but a write lands on only one of them. Every
+worker binds a Unix datagram socket in WISHLIST_BUS_DIR; send() delivers a
+message to every other worker's socket, where a reader thread hands it to
+the handler registered for its topic. Datagrams keep each message whole and
+need no broker, file rotation or polling.
+
+The bus is on when WISHLIST_WORKERS is above 1 (serve.py sets it) or with
+WISHLIST_BUS=true, and is a no-op otherwise.
+"""
+import logging
+import os
+import socket
+import threading
+from typing import Callable, Dict, Optional
+
+import orjson
+
+from database import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("WISHLIST_WORKERS", "1"))
+BUS_ENABLED = os.getenv("WISHLIST_BUS", "true" if WORKERS > 1 else "false").lower() in ("1", "true", "yes")
+BUS_DIR = os.getenv("WISHLIST_BUS_DIR", os.path.join(DATA_DIR, "bus"))
+# Larger messages are replaced by the topic's fallback; Linux allows about
+# 200 KiB per datagram by default
+MAX_MESSAGE_BYTES = 64 * 1024
+# A worker too busy to drain its socket must not stall the sender's request
+SEND_TIMEOUT = 0.5
+
+_handlers: Dict[str, Callable[[dict], None]] = {}
+_socket: Optional[socket.socket] = None
+_sender: Optional[socket.socket] = None
+_path: Optional[str] = None
+
+
+def register(topic: str, handler: Callable[[dict], None]) -> None:
+    """Call handler(payload) for messages on `topic` sent by other workers.
+
+    Handlers run on the bus reader thread and must be thread-safe.
+    """
+    _handlers[topic] = handler
+
+
+def start() -> None:
+    """Bind this worker's socket and start receiving; call once per process at startup."""
+    global _socket, _sender, _path
+    if not BUS_ENABLED or _socket is not None:
+        return
+    os.makedirs(BUS_DIR, exist_ok=True)
+    _path = os.path.join(BUS_DIR, f"{os.getpid()}.sock")
+    if os.path.exists(_path):
+        os.unlink(_path)
+    _socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    _socket.bind(_path)
+    _sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    _sender.settimeout(SEND_TIMEOUT)
+    threading.Thread(target=_receive, args=(_socket,), name="wishlist-bus", daemon=True).start()
+    logger.info(f"Listening for other workers on {_path}")
+
+
+def stop() -> None:
+    global _socket, _sender, _path
+    if _socket is None:
+        return
+    sock, path = _socket, _path
+    _socket = _path = None
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    try:
+        # Wakes the reader thread out of recv()
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
+    _sender.close()
+    _sender = None
+
+
+def _receive(sock: socket.socket) -> None:
+    while True:
+        try:
+            data = sock.recv(MAX_MESSAGE_BYTES * 2)
+        except OSError:
+            return
+        if not data:
+            return  # shut down by stop()
+        try:
+            message = orjson.loads(data)
+            handler = _handlers.get(message["topic"])
+            if handler is not None:
+                handler(message["payload"])
+        except Exception:
+            logger.exception("Failed to handle a message from another worker")
+
+
+def send(topic: str, payload: dict, fallback: Optional[dict] = None) -> None:
+    """Deliver payload to every other worker; `fallback` is sent instead if it is too large."""
+    sender = _sender
+    if sender is None:
+        return
+    data = orjson.dumps({"topic": topic, "payload": payload})
+    if len(data) > MAX_MESSAGE_BYTES:
+        if fallback is None:
+            logger.warning(f"Dropping oversized {topic} message ({len(data)} bytes)")
+            return
+        data = orjson.dumps({"topic": topic, "payload": fallback})
+
+    for entry in os.scandir(BUS_DIR):
+        if entry.path == _path or not entry.name.endswith(".sock"):
+            continue
+        try:
+            sender.sendto(data, entry.path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # A worker that exited without cleaning up
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+        except OSError as e:
+            logger.warning(f"Could not notify worker at {entry.path}: {e}")
@@ -1,11 +1,35 @@
-import requests
+"""Populate a database with test data.
+
+    python create_test_data.py                      # a few demo wishlists over HTTP
+    python create_test_data.py --bulk --users 1000 --wishlists 5 --items 40 --shares 2
+
+--bulk writes straight to WISHLIST_DB_PATH with batched SQL inserts and is
+deterministic for a given --seed, so benchmark runs on different commits
+start from the same data. Every bulk user has the password testpass123.
+"""
+import argparse
+import os
+import random
+import sys
 import time
 from datetime import datetime, timedelta
-from database import SessionLocal
+
+try:
+    import requests
+except ImportError:  # only the demo data over HTTP needs it
+    requests = None
+from sqlalchemy import func, insert, select
+
+from database import SessionLocal, engine, init_db
 import auth
 import models
+import revisions
 
-BASE_URL = "http://localhost:8001"
+BASE_URL = os.getenv("WISHLIST_BASE_URL", "http://localhost:8001")
+TEST_PASSWORD = "testpass123"
+# Bulk rows carry fixed timestamps so reruns produce identical data
+BULK_EPOCH = datetime(2024, 1, 1)
+BULK_BATCH_SIZE = 10000
 
 def create_test_user():
     # Create test user in database directly
@@ -20,7 +44,7 @@ def create_test_user():
         test_user = models.User(
             username="testuser",
             email="test@example.com",
-            hashed_password=auth.get_password_hash("testpass123"),
+            hashed_password=auth.get_password_hash(TEST_PASSWORD),
             is_active=True
         )
         db.add(test_user)
@@ -35,7 +59,7 @@ def get_auth_token():
     session = requests.Session()
     login_data = {
         "username": "testuser",
-        "password": "testpass123",
+        "password": TEST_PASSWORD,
         "grant_type": "password"
     }
     
@@ -80,6 +104,16 @@ def add_item(wishlist_id, name, link="", auth_token=""):
         raise Exception(f"Failed to add item: {response.text}")
     return response.json()
 
+def add_items(wishlist_id, items, auth_token=""):
+    response = requests.post(
+        f"{BASE_URL}/api/wishlists/{wishlist_id}/items/bulk",
+        json=[{"name": name, "link": link} for name, link in items],
+        cookies={"access_token": auth_token}
+    )
+    if response.status_code != 200:
+        raise Exception(f"Failed to add items: {response.text}")
+    return response.json()
+
 def mark_purchased(item_id, auth_token):
     response = requests.post(
         f"{BASE_URL}/api/items/{item_id}/purchase",
@@ -106,12 +140,11 @@ def create_test_data():
         ("PS5 DualSense Controller", "https://www.playstation.com/accessories/dualsense-wireless-controller/"),
         ("Gaming Chair", "https://secretlab.co/"),
     ]
-    for name, link in items:
-        item = add_item(gaming["id"], name, link, auth_token)
+    for item in add_items(gaming["id"], items, auth_token):
+        name = item["name"]
         # Mark some items as purchased
         if name in ["Zelda: Tears of the Kingdom", "Gaming Chair"]:
             mark_purchased(item["id"], auth_token)
-            time.sleep(1)  # Add delay to show different purchase times
     
     # Kitchen Wishlist
     kitchen = create_wishlist("Kitchen Upgrades", "Jamie", auth_token)
@@ -122,11 +155,10 @@ def create_test_data():
         ("Espresso Machine", "https://www.breville.com/us/en/products/espresso.html"),
         ("Air Fryer", "https://www.ninja.com/air-fryers"),
     ]
-    for name, link in items:
-        item = add_item(kitchen["id"], name, link, auth_token)
+    for item in add_items(kitchen["id"], items, auth_token):
+        name = item["name"]
         if name in ["Chef's Knife"]:
             mark_purchased(item["id"], auth_token)
-            time.sleep(1)
 
     # Books Wishlist
     books = create_wishlist("Book List", "Sam", auth_token)
@@ -136,13 +168,130 @@ def create_test_data():
         ("The Midnight Library", "https://www.amazon.com/Midnight-Library-Matt-Haig/dp/0525559474"),
         ("Klara and the Sun", "https://www.amazon.com/Klara-Sun-novel-Kazuo-Ishiguro/dp/059331817X"),
     ]
-    for name, link in items:
-        item = add_item(books["id"], name, link, auth_token)
+    for item in add_items(books["id"], items, auth_token):
+        name = item["name"]
         if name in ["Dune"]:
             mark_purchased(item["id"], auth_token)
-            time.sleep(1)
 
     print("Test data created successfully!")
 
+def _next_id(conn, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+def _insert_batches(model, rows, kind=None):
+    # One transaction per batch keeps memory flat and lets other readers in
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BULK_BATCH_SIZE:
+            _flush_batch(model, batch, kind)
+            batch = []
+    if batch:
+        _flush_batch(model, batch, kind)
+
+def _flush_batch(model, batch, kind):
+    with engine.begin() as conn:
+        conn.execute(insert(model), batch)
+        # Logged like any other write so delta-sync clients see the rows
+        revisions.bump_revision(conn, [(kind, row["id"]) for row in batch] if kind else ())
+
+def seed_bulk(users, wishlists_per_user, items_per_wishlist, shares_per_wishlist, seed=0):
+    """Insert users x wishlists x items (+ shares) directly with batched SQL.
+
+    Returns the id ranges that were created.
+    """
+    rng = random.Random(seed)
+    # bcrypt is deliberately slow: hash once and share it between all users
+    hashed_password = auth.get_password_hash(TEST_PASSWORD)
+    with engine.connect() as conn:
+        first_user = _next_id(conn, models.User)
+        first_wishlist = _next_id(conn, models.Wishlist)
+        first_item = _next_id(conn, models.Item)
+        first_share = _next_id(conn, models.WishlistShare)
+    user_ids = range(first_user, first_user + users)
+    wishlist_count = users * wishlists_per_user
+
+    _insert_batches(models.User, (
+        {
+            "id": user_id,
+            "username": f"user{user_id}",
+            "email": f"user{user_id}@example.com",
+            "hashed_password": hashed_password,
+            "is_active": True,
+            "created_at": BULK_EPOCH,
+        }
+        for user_id in user_ids
+    ))
+
+    def wishlist_rows():
+        for n in range(wishlist_count):
+            yield {
+                "id": first_wishlist + n,
+                "name": f"Wishlist {first_wishlist + n}",
+                "person": f"Person {rng.randrange(max(users, 1) * 2)}",
+                "owner_id": first_user + n // wishlists_per_user,
+                "created_at": BULK_EPOCH + timedelta(seconds=n),
+            }
+    _insert_batches(models.Wishlist, wishlist_rows(), "wishlist")
+
+    def share_rows():
+        share_id = first_share
+        for n in range(wishlist_count):
+            owner_id = first_user + n // wishlists_per_user
+            candidates = [u for u in rng.sample(user_ids, min(users, shares_per_wishlist + 1)) if u != owner_id]
+            for user_id in candidates[:shares_per_wishlist]:
+                yield {
+                    "id": share_id,
+                    "wishlist_id": first_wishlist + n,
+                    "user_id": user_id,
+                    "can_edit": rng.random() < 0.2,
+                    "created_at": BULK_EPOCH,
+                }
+                share_id += 1
+    _insert_batches(models.WishlistShare, share_rows())
+
+    def item_rows():
+        for n in range(wishlist_count * items_per_wishlist):
+            purchased = rng.random() < 0.3
+            created_at = BULK_EPOCH + timedelta(seconds=n)
+            yield {
+                "id": first_item + n,
+                "name": f"Item {first_item + n}",
+                "link": f"https://example.com/items/{first_item + n}",
+                "wishlist_id": first_wishlist + n // items_per_wishlist,
+                "purchased": purchased,
+                "purchase_date": created_at + timedelta(days=1) if purchased else None,
+                "created_at": created_at,
+            }
+    _insert_batches(models.Item, item_rows(), "item")
+
+    return {
+        "users": [first_user, first_user + users - 1],
+        "wishlists": [first_wishlist, first_wishlist + wishlist_count - 1],
+        "items": [first_item, first_item + wishlist_count * items_per_wishlist - 1],
+    }
+
+def main():
+    global BASE_URL
+    parser = argparse.ArgumentParser(description="Populate the database with test data")
+    parser.add_argument("--base-url", default=BASE_URL, help="Server for the demo data (default: %(default)s)")
+    parser.add_argument("--bulk", action="store_true", help="Insert a large dataset directly into the database")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--wishlists", type=int, default=3, help="Wishlists per user")
+    parser.add_argument("--items", type=int, default=10, help="Items per wishlist")
+    parser.add_argument("--shares", type=int, default=1, help="Shares per wishlist")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.bulk:
+        BASE_URL = args.base_url
+        create_test_data()
+        return
+
+    init_db()
+    started = time.perf_counter()
+    created = seed_bulk(args.users, args.wishlists, args.items, args.shares, args.seed)
+    print(f"Seeded {created} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
 if __name__ == "__main__":
-    create_test_data()
+    main()
@@ -1,43 +1,283 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import functools
+import hashlib
+import inspect
 import os
+import random
+import sys
+import time
 import logging
 
 # Database configuration
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-os.makedirs(DATA_DIR, exist_ok=True)
 DB_PATH = os.getenv("WISHLIST_DB_PATH", os.path.join(DATA_DIR, "wishlists.db"))
 
-print(f"Using database at: {DB_PATH}")
+# "production" enables WAL and the tuned pragmas below, "legacy" keeps
+# SQLite's defaults (rollback journal) for comparison
+DB_PROFILE = os.getenv("WISHLIST_DB_PROFILE", "production")
+
+# SQLite pragmas applied to every new connection in the production profile
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("WISHLIST_SQLITE_JOURNAL_MODE", "WAL"),
+    # NORMAL is durable in WAL mode except for the last commits on power loss
+    "synchronous": os.getenv("WISHLIST_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("WISHLIST_SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    # Negative values are KiB: 64 MiB page cache per connection
+    "cache_size": int(os.getenv("WISHLIST_SQLITE_CACHE_SIZE", "-65536")),
+    "mmap_size": int(os.getenv("WISHLIST_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+# Serve API requests through SQLAlchemy's asyncio extension (aiosqlite)
+# instead of sync sessions on the threadpool
+DB_ASYNC = os.getenv("WISHLIST_DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Connection pool sizing; sync endpoints run on Starlette's 40-thread pool
+DB_POOL_SIZE = int(os.getenv("WISHLIST_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("WISHLIST_DB_MAX_OVERFLOW", "30"))
+
+# Retry policy for transactions that lose a lock race
+DB_RETRY_ATTEMPTS = int(os.getenv("WISHLIST_DB_RETRY_ATTEMPTS", "5"))
+DB_RETRY_BASE_DELAY = float(os.getenv("WISHLIST_DB_RETRY_BASE_DELAY", "0.01"))
 
 # Configure logging
 logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+def _install_pragmas(db_engine):
+    @event.listens_for(db_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def create_db_engine(db_path: str = DB_PATH, profile: str = DB_PROFILE):
+    """Build the SQLite engine for the given profile."""
+    if profile == "legacy":
+        return create_engine(
+            f"sqlite:///{db_path}",
+            connect_args={"check_same_thread": False},
+            echo=False
+        )
+
+    db_engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False},
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        echo=False  # Disable SQL statement logging
+    )
+    _install_pragmas(db_engine)
+    return db_engine
+
+def create_async_db_engine(db_path: str = DB_PATH, profile: str = DB_PROFILE):
+    """Build an aiosqlite engine; needs the optional aiosqlite package."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    if profile == "legacy":
+        return create_async_engine(f"sqlite+aiosqlite:///{db_path}", echo=False)
+
+    db_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}",
+        # aiosqlite defaults to NullPool, which reconnects (and re-runs the
+        # pragmas) for every session
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        echo=False
+    )
+    _install_pragmas(db_engine.sync_engine)
+    return db_engine
 
 # Create engine
-engine = create_engine(
-    f"sqlite:///{DB_PATH}", 
-    connect_args={"check_same_thread": False},
-    echo=False  # Disable SQL statement logging
-)
+engine = create_db_engine()
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = create_async_db_engine()
+    # Objects must stay readable after commit: serialization happens outside
+    # the greenlet that could lazily refresh them
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create base class for declarative models
 Base = declarative_base()
 
 # Database Dependency
-def get_db():
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+get_db = get_async_db if DB_ASYNC else get_sync_db
+
+async def run_db(db, func, *args):
+    """Call func(sync_session, *args) from a coroutine without blocking the loop.
+
+    With an AsyncSession the work runs through run_sync on aiosqlite; with a
+    plain Session it is pushed to the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(func, *args)
+    return await run_in_threadpool(func, db, *args)
+
+def db_endpoint(func):
+    """Adapt a sync endpoint taking `db` to the configured database layer.
+
+    In sync mode the endpoint is returned untouched and FastAPI runs it on the
+    threadpool. In async mode it becomes a coroutine that runs the same body
+    against the request's AsyncSession, so no threadpool slot is taken.
+    Returned ORM objects must already be loaded, since serialization happens
+    after the body has left the session's greenlet.
+    """
+    if not DB_ASYNC:
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        async_db = kwargs.pop("db")
+        return await async_db.run_sync(lambda db: func(*args, db=db, **kwargs))
+    return wrapper
+
+def is_lock_error(error: OperationalError) -> bool:
+    message = str(error.orig).lower()
+    return "database is locked" in message or "database is busy" in message
+
+def backoff_delays():
+    delay = DB_RETRY_BASE_DELAY
+    for _ in range(DB_RETRY_ATTEMPTS - 1):
+        yield delay * (1 + random.random())
+        delay *= 2
+
+def _sessions(args, kwargs):
+    return [v for v in list(args) + list(kwargs.values()) if isinstance(v, (Session, AsyncSession))]
+
+def retry_on_locked(func):
+    """Re-run a unit of work when SQLite reports lock contention.
+
+    busy_timeout already waits inside SQLite, but a deferred transaction that
+    read before another writer committed fails immediately with SQLITE_BUSY.
+    The wrapped function is re-run from scratch after rolling back any
+    session it was given, with jittered exponential backoff between attempts.
+    Coroutine functions are retried with asyncio.sleep.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            for attempt, delay in enumerate(backoff_delays(), start=1):
+                try:
+                    return await func(*args, **kwargs)
+                except OperationalError as e:
+                    if not is_lock_error(e):
+                        raise
+                    for db in _sessions(args, kwargs):
+                        result = db.rollback()
+                        if inspect.isawaitable(result):
+                            await result
+                    logger.warning(f"Database locked, retrying {func.__name__} (attempt {attempt})")
+                    await asyncio.sleep(delay)
+            return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt, delay in enumerate(backoff_delays(), start=1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                for db in _sessions(args, kwargs):
+                    db.rollback()
+                logger.warning(f"Database locked, retrying {func.__name__} (attempt {attempt})")
+                time.sleep(delay)
+        return func(*args, **kwargs)
+    return wrapper
+
+def schema_fingerprint(db_engine=None) -> int:
+    """Hash of the DDL init_db runs, sized to fit SQLite's user_version header field.
+
+    Any change to a model, index, the search index or the set of migrations
+    changes it, so a database stamped with the current fingerprint needs no
+    DDL at all.
+    """
+    from sqlalchemy.schema import CreateIndex, CreateTable
+
+    import migrate
+    import models  # noqa: F401  registers the tables on Base.metadata
+    import search
+    dialect = (db_engine or engine).dialect
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        statements.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            statements.append(str(CreateIndex(index).compile(dialect=dialect)))
+    statements.extend(search.schema_statements())
+    statements.extend(migrate.version_files())
+    digest = hashlib.sha256("\n".join(statements).encode()).digest()
+    # user_version is a signed 32-bit integer and 0 means "never stamped"
+    return int.from_bytes(digest[:4], "big") & 0x7FFFFFFF or 1
+
+def stored_fingerprint(db_engine=None) -> int:
+    with (db_engine or engine).connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
 # Create database tables
-def init_db():
-    import models  # Import models here to avoid circular imports
-    print("Initializing database...")
-    Base.metadata.create_all(bind=engine)
-    print("Database initialized.")
+def init_db(force: bool = False):
+    """Apply pending migrations and create missing tables, indexes and the search index.
+
+    Skipped when the database is stamped with the current schema fingerprint,
+    which is the common case for every start after the first: one PRAGMA read
+    instead of inspecting every table. Workers that do find work take turns
+    through the lock file, so only the first one creates anything.
+    """
+    import fcntl
+
+    import migrate
+    import search
+    # stderr, so scripts can stream data on stdout
+    print(f"Using database at: {DB_PATH}", file=sys.stderr)
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    fingerprint = schema_fingerprint()
+    if not force and stored_fingerprint() == fingerprint:
+        return
+    with open(f"{DB_PATH}.init.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # Another worker may have finished while this one waited
+        if not force and stored_fingerprint() == fingerprint:
+            return
+        print("Initializing database...", file=sys.stderr)
+        migrate.upgrade(engine)
+        Base.metadata.create_all(bind=engine)
+        # create_all skips tables that already exist, so add any indexes that
+        # were introduced after the database file was created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        search.create_search_index(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {fingerprint}")
+            backfills = migrate.pending_backfills(conn)
+        print("Database initialized.", file=sys.stderr)
+        if backfills:
+            # Long-running by design, so not part of every worker's startup
+            logger.warning(f"{len(backfills)} data backfill(s) unfinished; run `python migrate.py backfill`")
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import AsyncIterator, Iterable, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+import bus
+
+logger = logging.getLogger(__name__)
+
+# Seconds between SSE comment lines that keep idle connections open through proxies
+HEARTBEAT_INTERVAL = float(os.getenv("WISHLIST_SSE_HEARTBEAT", "15"))
+# Events buffered per subscriber before it is considered too slow and dropped
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("WISHLIST_SSE_QUEUE_SIZE", "100"))
+
+_HEARTBEAT = b": heartbeat\n\n"
+# Sent to a subscriber that fell behind; the client refetches and reconnects
+_RESYNC = b"event: resync\ndata: {}\n\n"
+# Client reconnect delay in milliseconds
+_RETRY = b"retry: 3000\n\n"
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, wishlist_id: Optional[int]):
+        self.loop = loop
+        self.wishlist_id = wishlist_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, wishlist_ids: Optional[frozenset]) -> bool:
+        return self.wishlist_id is None or (wishlist_ids is not None and self.wishlist_id in wishlist_ids)
+
+    def force_resync(self) -> None:
+        # Runs on the subscriber's event loop; wakes the stream so it sees the flag
+        self.overflowed = True
+        try:
+            self.queue.put_nowait(_HEARTBEAT)
+        except asyncio.QueueFull:
+            pass
+
+    def offer(self, payload: bytes) -> None:
+        # Runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            logger.warning("Dropping slow event subscriber")
+
+
+class EventHub:
+    """Fan out change events to SSE subscribers in this process.
+
+    publish() may be called from any thread (sync endpoints run on the
+    threadpool). Each event is encoded once and the same bytes are handed to
+    every subscriber; a subscriber whose buffer is full is cut off instead of
+    making publishers wait or letting memory grow. With several workers, the
+    encoded event is also relayed over the bus to the other processes'
+    subscribers.
+    """
+
+    def __init__(self):
+        self._subscribers: set = set()
+        self._lock = threading.Lock()
+        bus.register("events", self._relayed)
+
+    def subscribe(self, wishlist_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop(), wishlist_id)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type: str, data, revision: int, wishlist_ids: Optional[Iterable[int]] = None) -> None:
+        """Send an event to every interested subscriber.
+
+        wishlist_ids names the wishlists the event touches; subscribers that
+        filtered on a wishlist only receive events for it. Call after commit.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers and not bus.BUS_ENABLED:
+            return
+
+        wishlist_ids = list(wishlist_ids) if wishlist_ids is not None else None
+        body = json.dumps({"type": event_type, "revision": revision, "data": jsonable_encoder(data)})
+        payload = f"id: {revision}\nevent: {event_type}\ndata: {body}\n\n"
+        # Too big for one datagram: other workers' clients refetch instead
+        bus.send("events", {"payload": payload, "wishlist_ids": wishlist_ids}, fallback={"resync": True})
+        self._deliver(subscribers, payload.encode("utf-8"), wishlist_ids)
+
+    def resync(self) -> None:
+        """Make every subscriber in this process refetch and reconnect."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            self._call(subscription, subscription.force_resync)
+
+    def _relayed(self, message: dict) -> None:
+        if message.get("resync"):
+            self.resync()
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        self._deliver(subscribers, message["payload"].encode("utf-8"), message["wishlist_ids"])
+
+    def _deliver(self, subscribers: list, payload: bytes, wishlist_ids: Optional[Iterable[int]]) -> None:
+        wishlist_ids = frozenset(wishlist_ids) if wishlist_ids is not None else None
+        for subscription in subscribers:
+            if subscription.wants(wishlist_ids):
+                self._call(subscription, subscription.offer, payload)
+
+    def _call(self, subscription: Subscription, callback, *args) -> None:
+        try:
+            subscription.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The subscriber's loop has shut down
+            self.unsubscribe(subscription)
+
+    async def stream(self, wishlist_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield SSE frames for one client until it disconnects or falls behind."""
+        subscription = self.subscribe(wishlist_id)
+        try:
+            yield _RETRY
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    payload = _HEARTBEAT
+                if subscription.overflowed:
+                    yield _RESYNC
+                    return
+                yield payload
+        finally:
+            self.unsubscribe(subscription)
+
+
+hub = EventHub()
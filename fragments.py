@@ -0,0 +1,64 @@
+"""Server-side rendering of the viewer's wishlist cards, cached per wishlist.
+
+With WISHLIST_VIEWER_SSR on, /viewer ships every wishlist in its first
+response instead of an empty shell that fetches /api/wishlists. Each card
+is rendered from templates/_wishlist_card.html and cached under a key made
+of exactly what the card shows, which acts as the wishlist's revision: a
+purchase bumps the item's version, and adding or removing an item changes
+the item list. When any write invalidates the whole page, only the cards
+whose key changed are rendered again.
+"""
+import os
+from typing import Tuple
+
+from markupsafe import Markup
+from sqlalchemy import select
+
+import models
+import revisions
+import serialize
+from cache import LRUCache
+
+VIEWER_SSR = os.getenv("WISHLIST_VIEWER_SSR", "false").lower() in ("1", "true", "yes")
+# Rendered cards kept; each is a few KB of HTML
+FRAGMENT_CACHE_SIZE = int(os.getenv("WISHLIST_FRAGMENT_CACHE_SIZE", "2000"))
+
+CARD_TEMPLATE = "_wishlist_card.html"
+_ITEM_KEY_FIELDS = ("id", "name", "link", "purchased", "purchase_date", "version")
+
+fragment_cache = LRUCache(max_size=FRAGMENT_CACHE_SIZE)
+
+
+def load_wishlists(db) -> Tuple[int, list]:
+    """The dataset revision and every wishlist with its items, as dicts."""
+    # Revision first: if a write lands in between, the page is stored under
+    # the older revision and is invalidated rather than served stale
+    revision, _ = revisions.current_revision(db)
+    rows = db.execute(
+        select(*serialize.WISHLIST_COLUMNS).order_by(models.Wishlist.created_at, models.Wishlist.id)
+    ).all()
+    return revision, serialize.wishlist_tree(db, rows)
+
+
+def fragment_key(wishlist: dict) -> tuple:
+    return (
+        wishlist["id"],
+        wishlist["name"],
+        wishlist["person"],
+        tuple(tuple(item[field] for field in _ITEM_KEY_FIELDS) for item in wishlist["items"]),
+    )
+
+
+def render_wishlists(env, wishlists: list) -> Markup:
+    """Concatenate the cards, rendering only those not in the cache."""
+    template = env.get_template(CARD_TEMPLATE)
+    parts = []
+    for wishlist in wishlists:
+        key = fragment_key(wishlist)
+        html = fragment_cache.get(key)
+        if html is None:
+            # The template's indentation is a quarter of a large page
+            html = "\n".join(line.strip() for line in template.render(wishlist=wishlist).splitlines())
+            fragment_cache.set(key, html)
+        parts.append(html)
+    return Markup("".join(parts))
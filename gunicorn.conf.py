@@ -0,0 +1,22 @@
+"""gunicorn settings for running the app with uvicorn workers.
+
+    WISHLIST_WORKERS=4 gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+
+workers = int(os.getenv("WISHLIST_WORKERS", "1"))
+# Read by bus.py in every worker to decide whether to relay invalidations
+os.environ["WISHLIST_WORKERS"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"{os.getenv('WISHLIST_HOST', '0.0.0.0')}:{os.getenv('WISHLIST_PORT', '8000')}"
+
+
+def on_starting(server):
+    # Once in the master, before forking
+    import assets
+    import database
+
+    assets.prepare()
+    database.init_db()
+    # Forked workers must not share the master's SQLite connections
+    database.engine.dispose()
@@ -1,5 +1,4 @@
 import uvicorn
-from app import app
 from database import init_db
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+"""Request, SQL and bcrypt timings exposed in Prometheus text format.
+
+Everything is recorded in-process with plain counters and fixed-bucket
+histograms behind one lock each, which costs a few microseconds per request
+and needs no client library. Per-request SQL figures are collected through
+a ContextVar: Starlette copies the context into the threadpool and
+AsyncSession.run_sync stays in the request's task, so cursor events land on
+the request that caused them in both database modes.
+"""
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("WISHLIST_METRICS", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.label_names + ('le',), labels + (le,))} {cumulative}"
+                )
+            label_text = _labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple, values: Tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+requests_total = Counter(
+    "wishlist_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+request_seconds = Histogram(
+    "wishlist_http_request_duration_seconds", "Time to serve a request, including streaming.", ("method", "route")
+)
+request_sql_statements = Histogram(
+    "wishlist_http_request_sql_statements", "SQL statements executed per request.", ("route",), COUNT_BUCKETS
+)
+request_sql_seconds = Histogram(
+    "wishlist_http_request_sql_seconds", "Time spent in SQL per request.", ("route",)
+)
+sql_statements_total = Counter("wishlist_sql_statements_total", "SQL statements executed, in or out of requests.")
+sql_seconds_total = Counter("wishlist_sql_seconds_total", "Time spent executing SQL statements.")
+bcrypt_seconds = Histogram(
+    "wishlist_bcrypt_seconds", "Time a password worker spends in bcrypt.", ("operation",),
+    (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+REGISTRY = [
+    requests_total, request_seconds, request_sql_statements, request_sql_seconds,
+    sql_statements_total, sql_seconds_total, bcrypt_seconds,
+]
+
+
+class RequestStats:
+    __slots__ = ("sql_statements", "sql_seconds")
+
+    def __init__(self):
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("wishlist_request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    sql_statements_total.inc()
+    sql_seconds_total.inc(amount=elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.sql_seconds += elapsed
+
+
+def instrument_engine(db_engine) -> None:
+    """Time every statement run through `db_engine` (a sync Engine)."""
+    event.listen(db_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(db_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def route_label(scope) -> str:
+    # Route templates, never raw paths, keep label cardinality bounded
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope["path"].startswith("/static/"):
+        return "/static"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: no per-request Request objects or task hops."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            route = route_label(scope)
+            method = scope["method"]
+            requests_total.inc(method, route, status_code)
+            request_seconds.observe(elapsed, method, route)
+            request_sql_statements.observe(stats.sql_statements, route)
+            request_sql_seconds.observe(stats.sql_seconds, route)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
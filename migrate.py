@@ -0,0 +1,255 @@
+"""Versioned schema migrations (alembic) and online, batched backfills.
+
+    python migrate.py upgrade     # apply pending migrations, then run their backfills
+    python migrate.py status      # schema revision, pending migrations and backfill progress
+    python migrate.py backfill    # resume unfinished backfills only
+    python migrate.py revision -m "add item notes"   # new file in migrations/versions/
+
+Migrations live in migrations/versions/ and run against WISHLIST_DB_PATH.
+init_db() applies pending ones at startup too, so the app never serves an
+old schema; a new database is created from the models and stamped as
+current instead.
+
+Schema changes are quick in SQLite (ADD COLUMN rewrites nothing), but
+filling a new column for every existing row is not. A migration therefore
+only schedules its backfills; they run afterwards in short transactions over
+keyset-paginated id ranges, pausing between batches so viewers and other
+writers get the write lock in between. Each batch commits its cursor along
+with its updates, so an interrupted backfill resumes where it stopped.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+import database
+import revisions
+from response_cache import response_cache
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(ROOT, "migrations")
+VERSIONS_DIR = os.path.join(MIGRATIONS_DIR, "versions")
+
+# Rows visited per backfill transaction, and the pause that follows each one
+BATCH_SIZE = int(os.getenv("WISHLIST_MIGRATION_BATCH_SIZE", "1000"))
+PAUSE_MS = float(os.getenv("WISHLIST_MIGRATION_PAUSE_MS", "50"))
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+
+# Kept out of Base.metadata: it belongs to the migration machinery, not the app
+_metadata = MetaData()
+backfills_table = Table(
+    "schema_backfills",
+    _metadata,
+    Column("name", String, primary_key=True),
+    Column("revision", String, nullable=False),
+    Column("last_id", Integer, nullable=False, default=0),
+    Column("rows_updated", Integer, nullable=False, default=0),
+    Column("created_at", DateTime, default=datetime.utcnow),
+    Column("finished_at", DateTime, nullable=True),
+)
+
+
+class Backfill(NamedTuple):
+    """Sets `assignments` on every row of `table` matching `where`, by id range.
+
+    `where` must stop matching a row once it has been updated, so re-running
+    a batch is harmless. Updated rows are recorded in the change log under
+    `entity` ("item" or "wishlist"), so delta-sync clients pick them up.
+    """
+    table: str
+    assignments: str
+    where: str
+    entity: Optional[str] = None
+    params: Callable[[], dict] = dict
+
+
+def version_files() -> list:
+    """Migration file names, part of the schema fingerprint."""
+    try:
+        return sorted(name for name in os.listdir(VERSIONS_DIR) if name.endswith(".py"))
+    except FileNotFoundError:
+        return []
+
+
+def alembic_config(connection=None):
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    # env.py runs on this connection instead of opening its own
+    config.attributes["connection"] = connection
+    return config
+
+
+def column_names(connection, table: str) -> set:
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+
+def upgrade(db_engine) -> None:
+    """Apply pending migrations, or stamp a database that has no tables yet.
+
+    init_db() calls this before create_all(), which builds an empty database
+    straight at the current schema, so there is nothing to migrate.
+    """
+    from alembic import command
+
+    with db_engine.begin() as conn:
+        config = alembic_config(conn)
+        if not inspect(conn).has_table("items"):
+            command.stamp(config, "head")
+        else:
+            command.upgrade(config, "head")
+
+
+def schedule_backfill(connection, revision: str, name: str) -> None:
+    """Called from a migration's upgrade() to queue one of its BACKFILLS."""
+    backfills_table.create(connection, checkfirst=True)
+    exists = connection.execute(select(backfills_table.c.name).where(backfills_table.c.name == name)).first()
+    if exists is None:
+        connection.execute(backfills_table.insert().values(name=name, revision=revision))
+
+
+def pending_backfills(connection) -> list:
+    if not inspect(connection).has_table(backfills_table.name):
+        return []
+    return connection.execute(
+        select(backfills_table).where(backfills_table.c.finished_at.is_(None)).order_by(backfills_table.c.created_at)
+    ).all()
+
+
+def _definition(revision: str, name: str) -> Backfill:
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory.from_config(alembic_config()).get_revision(revision)
+    return script.module.BACKFILLS[name]
+
+
+@database.retry_on_locked
+def _run_batch(db_engine, name: str, backfill: Backfill, after: int, batch_size: int) -> Optional[tuple]:
+    """Update one id range; returns (last id visited, rows updated), or None when done."""
+    table, where = backfill.table, backfill.where
+    with db_engine.begin() as conn:
+        # The range is bounded by rows visited, not rows matched, so a batch
+        # stays short however sparse the matching rows are
+        upper = conn.execute(
+            text(f"SELECT max(id) FROM (SELECT id FROM {table} WHERE id > :after ORDER BY id LIMIT :limit)"),
+            {"after": after, "limit": batch_size},
+        ).scalar()
+        if upper is None:
+            conn.execute(
+                backfills_table.update().where(backfills_table.c.name == name).values(finished_at=datetime.utcnow())
+            )
+            return None
+        bounds = {"after": after, "upper": upper}
+        in_range = f"id > :after AND id <= :upper AND ({where})"
+        ids = conn.execute(text(f"SELECT id FROM {table} WHERE {in_range}"), bounds).scalars().all()
+        if ids:
+            conn.execute(
+                text(f"UPDATE {table} SET {backfill.assignments} WHERE {in_range}"), {**bounds, **backfill.params()}
+            )
+            if backfill.entity:
+                revision = revisions.bump_revision(conn, [(backfill.entity, id) for id in ids])
+        conn.execute(
+            backfills_table.update()
+            .where(backfills_table.c.name == name)
+            .values(last_id=upper, rows_updated=backfills_table.c.rows_updated + len(ids))
+        )
+    if ids and backfill.entity:
+        response_cache.invalidate(revision)
+    return upper, len(ids)
+
+
+def run_backfill(db_engine, row, batch_size: int = BATCH_SIZE, pause: float = PAUSE_MS / 1000) -> int:
+    """Run one scheduled backfill to completion, printing progress; returns rows updated."""
+    backfill = _definition(row.revision, row.name)
+    with db_engine.connect() as conn:
+        max_id = conn.execute(text(f"SELECT max(id) FROM {backfill.table}")).scalar() or 0
+    after, updated = row.last_id, 0
+    started = last_report = time.perf_counter()
+    if after:
+        print(f"{row.name}: resuming after id {after}", file=sys.stderr)
+    while True:
+        result = _run_batch(db_engine, row.name, backfill, after, batch_size)
+        if result is None:
+            break
+        after, count = result
+        updated += count
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            done = min(after / max_id, 1.0) if max_id else 1.0
+            print(f"{row.name}: {done:.1%} (id {after} of {max_id}), {updated} rows updated, "
+                  f"{updated / (now - started):.0f} rows/s", file=sys.stderr)
+        time.sleep(pause)
+    print(f"{row.name}: done, {updated} rows updated in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return updated
+
+
+def run_backfills(db_engine, batch_size: int = BATCH_SIZE, pause: float = PAUSE_MS / 1000) -> None:
+    with db_engine.connect() as conn:
+        rows = pending_backfills(conn)
+    for row in rows:
+        run_backfill(db_engine, row, batch_size, pause)
+
+
+def status(db_engine) -> Dict[str, object]:
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory.from_config(alembic_config())
+    with db_engine.connect() as conn:
+        current = MigrationContext.configure(conn).get_current_revision()
+        backfills = [
+            {"name": row.name, "last_id": row.last_id, "rows_updated": row.rows_updated}
+            for row in pending_backfills(conn)
+        ]
+    head = script.get_current_head()
+    pending = [] if current == head else [rev.revision for rev in script.iterate_revisions(head, current)]
+    return {"current": current, "head": head, "pending": pending[::-1], "backfills": backfills}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help in (("upgrade", "Apply pending migrations, then run backfills"),
+                       ("backfill", "Resume unfinished backfills")):
+        cmd = commands.add_parser(name, help=help)
+        cmd.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows visited per transaction")
+        cmd.add_argument("--pause-ms", type=float, default=PAUSE_MS, help="Pause between transactions")
+    commands.add_parser("status", help="Show the schema revision and unfinished backfills")
+    revision_cmd = commands.add_parser("revision", help="Create a migration, autogenerated from the models")
+    revision_cmd.add_argument("-m", "--message", required=True)
+    revision_cmd.add_argument("--empty", action="store_true", help="Don't compare the models with the database")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        result = status(database.engine)
+        print(f"Database: {database.DB_PATH}")
+        print(f"Revision: {result['current']} (head {result['head']})")
+        print(f"Pending migrations: {', '.join(result['pending']) or 'none'}")
+        for backfill in result["backfills"]:
+            print(f"Unfinished backfill {backfill['name']}: after id {backfill['last_id']}, "
+                  f"{backfill['rows_updated']} rows updated")
+        return
+
+    if args.command == "revision":
+        from alembic import command
+
+        database.init_db()
+        next_id = f"{len(version_files()) + 1:04d}"
+        with database.engine.connect() as conn:
+            command.revision(alembic_config(conn), args.message, autogenerate=not args.empty, rev_id=next_id)
+        return
+
+    if args.command == "upgrade":
+        database.init_db(force=True)
+    run_backfills(database.engine, args.batch_size, args.pause_ms / 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Alembic environment: runs migrations against WISHLIST_DB_PATH via database.py."""
+from alembic import context
+
+import database
+import models  # noqa: F401  registers the tables on Base.metadata
+
+target_metadata = database.Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Tables that aren't models (the search index, schema_backfills) are not
+    # autogenerate's to drop
+    return not (type_ == "table" and reflected and compare_to is None)
+
+
+def run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # SQLite can't ALTER most things in place; batch mode copies the table
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    context.configure(
+        url=f"sqlite:///{database.DB_PATH}",
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+else:
+    connection = context.config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+    else:
+        with database.engine.begin() as connection:
+            run_migrations(connection)
@@ -0,0 +1,47 @@
+"""Add items.purchase_date, backfilled for items already purchased
+
+Replaces the first step of migrate_db.py. Items bought before the column
+existed get the time of the migration, as before, but through a batched
+backfill instead of one UPDATE of the whole table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+import migrate
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILLS = {
+    "items_purchase_date": migrate.Backfill(
+        table="items",
+        assignments="purchase_date = :now",
+        where="purchased = 1 AND purchase_date IS NULL",
+        entity="item",
+        params=lambda: {"now": datetime.utcnow()},
+    ),
+}
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    if "purchase_date" in migrate.column_names(connection, "items"):
+        return
+    op.add_column("items", sa.Column("purchase_date", sa.DateTime(), nullable=True))
+    migrate.schedule_backfill(connection, revision, "items_purchase_date")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("items") as batch_op:
+        batch_op.drop_column("purchase_date")
@@ -0,0 +1,33 @@
+"""Add items.version for optimistic concurrency on purchase toggles
+
+Replaces the second step of migrate_db.py. The server default fills every
+existing row without rewriting the table, so there is nothing to backfill.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+import migrate
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "version" in migrate.column_names(op.get_bind(), "items"):
+        return
+    op.add_column("items", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("items") as batch_op:
+        batch_op.drop_column("version")
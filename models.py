@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -29,6 +29,13 @@ class Wishlist(Base):
     owner = relationship("User", back_populates="wishlists")
     shared_with = relationship("WishlistShare", back_populates="wishlist", cascade="all, delete-orphan")
 
+    # Keyset pagination indexes: every filter column first, then (created_at, id)
+    __table_args__ = (
+        Index("ix_wishlists_created_at_id", "created_at", "id"),
+        Index("ix_wishlists_owner_created_at_id", "owner_id", "created_at", "id"),
+        Index("ix_wishlists_person_created_at_id", "person", "created_at", "id"),
+    )
+
 class WishlistShare(Base):
     __tablename__ = "wishlist_shares"
     id = Column(Integer, primary_key=True, index=True)
@@ -48,8 +55,33 @@ class Item(Base):
     link = Column(String, nullable=True)
     purchased = Column(Boolean, default=False)
     purchase_date = Column(DateTime, nullable=True)
+    # Bumped on every purchase state change, for optimistic concurrency
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=datetime.utcnow)
     wishlist_id = Column(Integer, ForeignKey("wishlists.id"))
     
     # Relationships
     wishlist = relationship("Wishlist", back_populates="items")
+
+    # Keyset pagination indexes; the wishlist_id one also serves the
+    # selectin load of Wishlist.items
+    __table_args__ = (
+        Index("ix_items_created_at_id", "created_at", "id"),
+        Index("ix_items_wishlist_created_at_id", "wishlist_id", "created_at", "id"),
+        Index("ix_items_purchased_created_at_id", "purchased", "created_at", "id"),
+    )
+
+class DatasetRevision(Base):
+    """Single-row counter bumped by every write to wishlists or items."""
+    __tablename__ = "dataset_revision"
+    id = Column(Integer, primary_key=True)
+    revision = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ChangeLog(Base):
+    """Which wishlists and items each revision touched, for delta sync."""
+    __tablename__ = "change_log"
+    id = Column(Integer, primary_key=True)
+    revision = Column(Integer, nullable=False, index=True)
+    entity = Column(String, nullable=False)  # "wishlist" or "item"
+    entity_id = Column(Integer, nullable=False)
@@ -0,0 +1,49 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+# Upper bound for the `limit` query parameter on paginated endpoints
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(query, model, cursor: Optional[str], limit: int):
+    """Apply keyset pagination on (created_at, id) and return (rows, next_cursor).
+
+    The WHERE clause is a row-value comparison so SQLite can seek straight to
+    the cursor position in the matching (…, created_at, id) index instead of
+    scanning and discarding an OFFSET worth of rows.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) > tuple_(created_at, row_id))
+    rows = query.order_by(model.created_at, model.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    # The body stays a plain JSON array; the continuation travels in a header
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
@@ -0,0 +1,234 @@
+"""Stack-sampling profiles of slow requests, written as speedscope and collapsed-stack files.
+
+While requests are in flight a background thread samples the stacks of every
+thread with sys._current_frames() into a short ring buffer. When a request
+takes longer than WISHLIST_PROFILE_SLOW_MS, the samples taken during it are
+written to WISHLIST_PROFILE_DIR. Requests under the threshold cost one
+counter update; with the threshold unset nothing is installed at all.
+
+A profile holds every busy thread, not just the one serving the request, so
+contention shows up too: bcrypt workers hogging the GIL, other requests
+holding the SQLite write lock. Open the .speedscope.json files at
+https://www.speedscope.app, or feed the .folded files to flamegraph.pl.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from database import DATA_DIR
+from metrics import route_label
+
+logger = logging.getLogger(__name__)
+
+# Unset or 0 disables profiling
+PROFILE_SLOW_MS = float(os.getenv("WISHLIST_PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("WISHLIST_PROFILE_INTERVAL_MS", "10"))
+PROFILE_DIR = os.getenv("WISHLIST_PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+# Newest profiles kept; older ones are deleted as new ones are written
+PROFILE_KEEP = int(os.getenv("WISHLIST_PROFILE_KEEP", "50"))
+# Seconds of samples retained, which bounds the longest request fully covered
+PROFILE_WINDOW = float(os.getenv("WISHLIST_PROFILE_WINDOW", "30"))
+
+# Leaf frames of threads that are parked waiting for work
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("core.py", "_connection_worker_thread"),  # aiosqlite
+}
+
+Frame = Tuple[str, str, int]  # (function, file, line)
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    """Frames from the outermost call to `frame`."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, frame.f_lineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class Sampler:
+    """Samples all threads while at least one request is being served."""
+
+    def __init__(self, interval: float, window: float):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=max(1, int(window / interval)))
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start_request(self) -> None:
+        with self._lock:
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="wishlist-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def end_request(self) -> None:
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                self._wake.clear()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            self._wake.wait()
+            now = time.perf_counter()
+            stacks = [
+                (ident, _stack(frame))
+                for ident, frame in sys._current_frames().items()
+                if ident != own and not _is_idle(frame)
+            ]
+            self.samples.append((now, stacks))
+            time.sleep(self.interval)
+
+    def window(self, started: float, ended: float) -> list:
+        return [sample for sample in list(self.samples) if started <= sample[0] <= ended]
+
+
+def _thread_names() -> Dict[int, str]:
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+
+def _format_frame(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed(samples: list, names: Dict[int, str]) -> str:
+    """Brendan Gregg's folded format: `thread;outer;...;inner count` per line."""
+    counts: Dict[str, int] = {}
+    for _, stacks in samples:
+        for ident, stack in stacks:
+            key = ";".join([names.get(ident, str(ident)), *map(_format_frame, stack)])
+            counts[key] = counts.get(key, 0) + 1
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+
+def speedscope(samples: list, names: Dict[int, str], title: str, interval_ms: float) -> dict:
+    """One sampled profile per thread, in speedscope's file format."""
+    frames: List[dict] = []
+    frame_index: Dict[Frame, int] = {}
+    profiles: Dict[int, dict] = {}
+    start = samples[0][0] if samples else 0.0
+    for taken, stacks in samples:
+        at = (taken - start) * 1000
+        for ident, stack in stacks:
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indices.append(frame_index[frame])
+            profile = profiles.setdefault(ident, {
+                "type": "sampled",
+                "name": names.get(ident, str(ident)),
+                "unit": "milliseconds",
+                "startValue": at,
+                "endValue": at,
+                "samples": [],
+                "weights": [],
+            })
+            profile["samples"].append(indices)
+            profile["weights"].append(interval_ms)
+            profile["endValue"] = at + interval_ms
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": title,
+        "exporter": "wishlist",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": list(profiles.values()),
+    }
+
+
+def _slug(text: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in text).strip("_") or "root"
+
+
+def write_profile(samples: list, method: str, route: str, elapsed: float, directory: str = PROFILE_DIR) -> Optional[str]:
+    """Write both formats for one request and trim the directory to PROFILE_KEEP."""
+    if not samples:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    names = _thread_names()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + f"{time.time() % 1:.3f}"[1:]
+    base = os.path.join(directory, f"{stamp}-{method}-{_slug(route)}-{elapsed * 1000:.0f}ms")
+    title = f"{method} {route} {elapsed * 1000:.0f} ms"
+    with open(f"{base}.speedscope.json", "w") as f:
+        json.dump(speedscope(samples, names, title, PROFILE_INTERVAL_MS), f)
+    with open(f"{base}.folded", "w") as f:
+        f.write(collapsed(samples, names))
+
+    # Names start with a UTC timestamp, so sorting them sorts by age
+    profiles = sorted(e.name for e in os.scandir(directory) if e.name.endswith(".speedscope.json"))
+    for name in profiles[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        stem = name[: -len(".speedscope.json")]
+        for suffix in (".speedscope.json", ".folded"):
+            try:
+                os.remove(os.path.join(directory, stem + suffix))
+            except FileNotFoundError:
+                pass
+    return base
+
+
+def _is_event_stream(scope) -> bool:
+    # Live-update connections stay open for minutes and would always be "slow"
+    return any(name == b"accept" and b"text/event-stream" in value for name, value in scope["headers"])
+
+
+class SlowRequestProfiler:
+    """ASGI middleware that writes a profile for each request over the threshold."""
+
+    def __init__(self, app, threshold_ms: float = PROFILE_SLOW_MS, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.app = app
+        self.threshold = threshold_ms / 1000
+        self.sampler = Sampler(interval_ms / 1000, PROFILE_WINDOW)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _is_event_stream(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self.sampler.start_request()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ended = time.perf_counter()
+            self.sampler.end_request()
+            elapsed = ended - started
+            if elapsed >= self.threshold:
+                samples = self.sampler.window(started, ended)
+                thread = threading.Thread(
+                    target=self._write, args=(samples, scope["method"], route_label(scope), elapsed), daemon=True
+                )
+                thread.start()
+
+    @staticmethod
+    def _write(samples: list, method: str, route: str, elapsed: float) -> None:
+        try:
+            path = write_profile(samples, method, route, elapsed)
+        except OSError as e:
+            logger.warning(f"Could not write slow request profile: {e}")
+            return
+        if path:
+            logger.info(f"Slow request {method} {route} took {elapsed * 1000:.0f} ms, profile at {path}")
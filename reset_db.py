@@ -1,21 +1,23 @@
 import os
-from database import Base, engine
-import models
+import backup
+from database import DB_PATH, init_db
 
 def reset_database():
-    # Get the database file path from the environment variable or use default
-    db_path = os.getenv('WISHLIST_DB_PATH', 'data/wishlist.db')
-    
+    db_path = DB_PATH
+
     # Ensure the data directory exists
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
-    # Remove existing database if it exists
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    # Remove existing database if it exists, keeping a snapshot to restore from
     if os.path.exists(db_path):
-        os.remove(db_path)
-        print(f"Removed existing database at {db_path}")
-    
+        saved = backup.snapshot(label="pre-reset")
+        for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"Removed existing database at {db_path} (saved as {saved})")
+
     # Create all tables
-    Base.metadata.create_all(bind=engine)
+    init_db()
     print(f"Created new database at {db_path}")
 
 if __name__ == "__main__":
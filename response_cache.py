@@ -0,0 +1,296 @@
+"""Cache of rendered responses for the public, read-mostly views.
+
+Every entry records the dataset revision read before its body was built,
+and the scopes its body depends on: ranges of wishlist ids, the tail of the
+list (where new wishlists appear), or ALL for views of the whole dataset.
+Writes call invalidate() with the revision they committed and the scopes
+they touched, which raises a floor for those scopes: entries below it are
+never served or stored again. A reader that raced a write therefore can't
+leave stale purchase state behind, even if it stores its entry after the
+invalidation ran. Without scopes, invalidate() drops everything.
+
+Backends:
+    memory  bounded in-process LRU (default)
+    file    entries and the floor on disk, shared by every worker on the host
+    off     no caching
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence
+
+from fastapi import Request, Response
+
+import bus
+from cache import LRUCache
+from database import DATA_DIR
+from revisions import etag_matches
+
+RESPONSE_CACHE_BACKEND = os.getenv("WISHLIST_RESPONSE_CACHE", "memory")
+RESPONSE_CACHE_SIZE = int(os.getenv("WISHLIST_RESPONSE_CACHE_SIZE", "256"))
+# Safety net for writes made outside this app (e.g. a transfer.py import
+# against a server using the memory backend)
+RESPONSE_CACHE_TTL = float(os.getenv("WISHLIST_RESPONSE_CACHE_TTL", "300"))
+# Larger bodies are served but not cached
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("WISHLIST_RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+RESPONSE_CACHE_DIR = os.getenv("WISHLIST_RESPONSE_CACHE_DIR", os.path.join(DATA_DIR, "response-cache"))
+
+# Scopes. Wishlists are grouped into runs of consecutive ids, so a page of
+# the list depends on a handful of scopes rather than one per wishlist
+ALL = "all"
+TAIL = "tail"
+SCOPE_WIDTH = 64
+# Scope floors kept in memory before they are folded into the global floor
+MAX_SCOPES = 10000
+
+
+def wishlist_scope(wishlist_id: int) -> str:
+    return f"wishlists-{wishlist_id // SCOPE_WIDTH}"
+
+
+def page_scopes(wishlist_ids: Iterable[int], last_page: bool) -> tuple:
+    """Scopes of one page of wishlists; only the last page gains new ones."""
+    scopes = {wishlist_scope(wishlist_id) for wishlist_id in wishlist_ids}
+    if last_page:
+        scopes.add(TAIL)
+    return tuple(sorted(scopes))
+
+
+class CachedResponse(NamedTuple):
+    revision: int
+    body: bytes
+    media_type: str
+    headers: dict
+    scopes: tuple = (ALL,)
+
+
+class MemoryBackend:
+    def __init__(self, max_size: int, ttl: float):
+        self._entries = LRUCache(max_size=max_size, ttl=ttl)
+        self._floor = 0
+        self._scope_floors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def floor(self) -> int:
+        return self._floor
+
+    def raise_floor(self, revision: int, scopes: Optional[Sequence[str]] = None) -> None:
+        with self._lock:
+            if scopes is None or len(self._scope_floors) >= MAX_SCOPES:
+                self._floor = max([self._floor, revision, *self._scope_floors.values()])
+                self._scope_floors.clear()
+                self._entries.clear()
+                return
+            for scope in scopes:
+                self._scope_floors[scope] = max(self._scope_floors.get(scope, 0), revision)
+            touched = set(scopes)
+            self._entries.delete_where(
+                lambda _, entry: entry.revision < revision and not touched.isdisjoint(entry.scopes)
+            )
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        return entry if entry is not None and entry.revision >= self._floor else None
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        # Under the lock, so an invalidation can't slip in between the check
+        # and the store
+        with self._lock:
+            floors = [self._floor, *(self._scope_floors.get(scope, 0) for scope in entry.scopes)]
+            if entry.revision >= max(floors):
+                self._entries.set(key, entry)
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+def _read_floor(path: str) -> int:
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _raise_floor_file(path: str, revision: int) -> bool:
+    """Store revision in path unless it already holds a higher one."""
+    import fcntl
+
+    with open(path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        if revision <= int(f.read().strip() or 0):
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(revision))
+        f.flush()
+    return True
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class FileBackend:
+    """One file per entry, plus floor files guarded by flock.
+
+    Good enough to share invalidation between uvicorn workers on one host
+    without running a separate cache server. scopes/ holds a floor file per
+    scope and a `.keys` list of the entries stored under it, so a scoped
+    invalidation removes just those entries instead of scanning them all.
+    get() still checks an entry's floors, so one left behind is never served.
+    """
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+        self._floor_path = os.path.join(directory, "floor")
+        self._scopes_dir = os.path.join(directory, "scopes")
+        os.makedirs(self._scopes_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def floor(self) -> int:
+        return _read_floor(self._floor_path)
+
+    def _current(self, revision: int, scopes: Sequence[str]) -> bool:
+        floors = [self.floor(), *(_read_floor(os.path.join(self._scopes_dir, scope)) for scope in scopes)]
+        return revision >= max(floors)
+
+    def raise_floor(self, revision: int, scopes: Optional[Sequence[str]] = None) -> None:
+        import fcntl
+
+        if scopes is None:
+            if _raise_floor_file(self._floor_path, revision):
+                for entry in os.scandir(self.directory):
+                    if entry.is_file() and entry.name != "floor" and not entry.name.endswith(".tmp"):
+                        _remove(entry.path)
+            return
+        for scope in scopes:
+            path = os.path.join(self._scopes_dir, scope)
+            # Floor first: set() checks it after listing its entry, so an
+            # entry missed below removes itself
+            _raise_floor_file(path, revision)
+            try:
+                with open(f"{path}.keys", "r+") as f:
+                    # Held across read and truncate, so no set() appends in between
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    names = set(f.read().split())
+                    f.truncate(0)
+            except FileNotFoundError:
+                continue
+            for name in names:
+                _remove(os.path.join(self.directory, name))
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            with open(self._path(key), "rb") as f:
+                header, body = f.read().split(b"\n", 1)
+        except (FileNotFoundError, ValueError):
+            return None
+        meta = json.loads(header)
+        if meta["stored_at"] + self.ttl < time.time() or not self._current(meta["revision"], meta["scopes"]):
+            return None
+        return CachedResponse(meta["revision"], body, meta["media_type"], meta["headers"], tuple(meta["scopes"]))
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        import fcntl
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        header = json.dumps({
+            "revision": entry.revision,
+            "media_type": entry.media_type,
+            "headers": entry.headers,
+            "scopes": entry.scopes,
+            "stored_at": time.time(),
+        })
+        with open(tmp_path, "wb") as f:
+            f.write(header.encode("utf-8") + b"\n" + entry.body)
+        os.replace(tmp_path, path)
+        name = os.path.basename(path)
+        for scope in entry.scopes:
+            with open(os.path.join(self._scopes_dir, f"{scope}.keys"), "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.write(name + "\n")
+        if not self._current(entry.revision, entry.scopes):
+            _remove(path)
+
+    def stats(self) -> dict:
+        return {"size": sum(1 for e in os.scandir(self.directory) if e.is_file() and e.name != "floor")}
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, request: Request, key: str) -> Optional[Response]:
+        """Serve a cached response (or a 304 for it), or None on a miss."""
+        if self.backend is None:
+            return None
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        etag = entry.headers.get("etag")
+        if etag and etag_matches(request, etag):
+            return Response(status_code=304, headers=entry.headers)
+        return Response(entry.body, media_type=entry.media_type, headers=entry.headers)
+
+    def store(self, key: str, revision: int, body: bytes, media_type: str, headers, scopes: tuple = (ALL,)) -> Response:
+        """Cache a freshly built body and return it as a response."""
+        headers = {k.lower(): v for k, v in headers.items() if k.lower() != "content-length"}
+        if self.backend is not None and len(body) <= RESPONSE_CACHE_MAX_BYTES:
+            self.backend.set(key, CachedResponse(revision, body, media_type, headers, scopes))
+        return Response(body, media_type=media_type, headers=headers)
+
+    def invalidate(self, revision: int, scopes: Optional[Sequence[str]] = None) -> None:
+        """Drop entries built before `revision` that depend on `scopes`
+        (everything without them); call after commit.
+        """
+        if self.backend is not None:
+            if scopes is not None:
+                # Views of the whole dataset change with any write
+                scopes = [*scopes, ALL]
+            self.backend.raise_floor(revision, scopes)
+            if isinstance(self.backend, MemoryBackend):
+                # The file backend is already shared between workers
+                bus.send("response_cache", {"revision": revision, "scopes": scopes})
+
+    def _relayed(self, message: dict) -> None:
+        if self.backend is not None:
+            self.backend.raise_floor(message["revision"], message.get("scopes"))
+
+    def stats(self) -> dict:
+        backend_stats = self.backend.stats() if self.backend is not None else {}
+        return {**backend_stats, "backend": RESPONSE_CACHE_BACKEND, "hits": self.hits, "misses": self.misses}
+
+
+def cache_key(request: Request, *extra) -> str:
+    """Route plus normalized query string, plus anything else the body depends on."""
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return "|".join([request.url.path, params, *map(str, extra)])
+
+
+def create_backend(name: str = RESPONSE_CACHE_BACKEND):
+    if name == "memory":
+        return MemoryBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+    if name == "file":
+        return FileBackend(RESPONSE_CACHE_DIR, RESPONSE_CACHE_TTL)
+    if name == "off":
+        return None
+    raise ValueError(f"Unknown WISHLIST_RESPONSE_CACHE backend: {name!r}")
+
+
+response_cache = ResponseCache(create_backend())
+bus.register("response_cache", response_cache._relayed)
@@ -0,0 +1,112 @@
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+import models
+
+# The counter lives in a single row
+_ROW_ID = 1
+
+# Revisions of change history kept for delta sync; older clients get a reset
+CHANGE_LOG_RETENTION = int(os.getenv("WISHLIST_CHANGE_LOG_RETENTION", "100000"))
+# Prune the change log once every this many revisions
+_PRUNE_EVERY = 100
+
+
+def bump_revision(db, changes: Iterable[Tuple[str, int]] = ()) -> int:
+    """Advance the dataset revision inside the caller's transaction.
+
+    `changes` lists the (entity, id) pairs the transaction created, modified
+    or deleted, and is recorded in the change log under the new revision.
+    Works with a Session or a Connection. SQLite already serializes writers,
+    so the shared row adds no contention of its own.
+    """
+    table = models.DatasetRevision.__table__
+    stmt = insert(table).values(id=_ROW_ID, revision=1, updated_at=datetime.utcnow())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={"revision": table.c.revision + 1, "updated_at": stmt.excluded.updated_at},
+    ).returning(table.c.revision)
+    revision = db.execute(stmt).scalar_one()
+
+    log = models.ChangeLog.__table__
+    rows = [{"revision": revision, "entity": entity, "entity_id": entity_id} for entity, entity_id in changes]
+    if rows:
+        db.execute(log.insert(), rows)
+    if revision % _PRUNE_EVERY == 0:
+        db.execute(log.delete().where(log.c.revision <= revision - CHANGE_LOG_RETENTION))
+    return revision
+
+
+def changed_since(db, since: int, limit: int) -> Optional[Tuple[int, dict]]:
+    """Return (revision, {entity: ids}) touched after `since`.
+
+    None means the client must fall back to a full fetch: it has no baseline
+    (since=0), its baseline has been pruned or is from another database, or
+    more than `limit` rows changed.
+    """
+    revision, _ = current_revision(db)
+    if since <= 0 or since > revision or since < revision - CHANGE_LOG_RETENTION:
+        return None
+
+    log = models.ChangeLog.__table__
+    touched = db.execute(
+        select(log.c.entity, log.c.entity_id)
+        .where(log.c.revision > since, log.c.revision <= revision)
+        .distinct()
+        .limit(limit + 1)
+    ).all()
+    if len(touched) > limit:
+        return None
+
+    ids = {"wishlist": set(), "item": set()}
+    for entity, entity_id in touched:
+        ids[entity].add(entity_id)
+    return revision, ids
+
+
+def current_revision(db) -> Tuple[int, Optional[datetime]]:
+    table = models.DatasetRevision.__table__
+    row = db.execute(
+        select(table.c.revision, table.c.updated_at).where(table.c.id == _ROW_ID)
+    ).first()
+    return (row.revision, row.updated_at) if row else (0, None)
+
+
+def etag_for(revision: int) -> str:
+    return f'W/"{revision}"'
+
+
+def conditional_response(request: Request, response: Response, db) -> Optional[Response]:
+    """Answer If-None-Match with a bare 304, or stamp validators on `response`.
+
+    The revision is read before the caller loads any data, so a write that
+    lands in between can only make the ETag older than the body, which costs
+    the client one extra full fetch but never a stale 304.
+    """
+    revision, updated_at = current_revision(db)
+    # Kept for callers that cache what they are about to build
+    request.state.revision = revision
+    headers = {"ETag": etag_for(revision), "Cache-Control": "no-cache"}
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(updated_at.replace(tzinfo=timezone.utc), usegmt=True)
+
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    # Weak comparison: W/"7" and "7" name the same revision
+    return "*" in candidates or bool({etag, etag[2:]} & candidates)
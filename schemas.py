@@ -29,13 +29,18 @@ class WishlistBase(BaseModel):
 class WishlistCreate(WishlistBase):
     pass
 
-class Wishlist(WishlistBase):
+class WishlistTreeCreate(WishlistBase):
+    items: List["ItemCreate"] = []
+
+class WishlistSummary(WishlistBase):
     id: int
     created_at: datetime
     owner_id: int
-    items: List["Item"] = []
     model_config = ConfigDict(from_attributes=True)
 
+class Wishlist(WishlistSummary):
+    items: List["Item"] = []
+
 class ItemBase(BaseModel):
     name: str
     link: Optional[str] = None
@@ -49,8 +54,23 @@ class Item(ItemBase):
     purchase_date: Optional[datetime]
     created_at: datetime
     wishlist_id: int
+    version: int
     model_config = ConfigDict(from_attributes=True)
 
+class PurchaseUpdate(BaseModel):
+    purchased: bool
+    # Item version the client last saw; omit to only require the state to change
+    version: Optional[int] = None
+
+class ChangeSet(BaseModel):
+    revision: int
+    # True when the client must refetch everything instead of applying a delta
+    reset: bool = False
+    wishlists: List[WishlistSummary] = []
+    items: List[Item] = []
+    deleted_wishlists: List[int] = []
+    deleted_items: List[int] = []
+
 class WishlistShareBase(BaseModel):
     can_edit: bool = False
 
@@ -67,3 +87,4 @@ class WishlistShare(WishlistShareBase):
 
 # Update forward references
 Wishlist.model_rebuild()
+WishlistTreeCreate.model_rebuild()
@@ -0,0 +1,148 @@
+"""Full-text search over items and wishlists with SQLite FTS5.
+
+items_fts and wishlists_fts are external-content tables: they index the
+text of the base tables without storing a second copy, and triggers keep
+them in step with every write, including bulk inserts and imports that
+bypass the ORM.
+
+Usage:
+    python search.py rebuild
+"""
+import argparse
+import base64
+import binascii
+import re
+import sys
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+import database
+
+# FTS table -> (base table, indexed columns, bm25 weight per column)
+INDEXES = {
+    "items_fts": ("items", ("name", "link"), (10.0, 1.0)),
+    "wishlists_fts": ("wishlists", ("name", "person"), (10.0, 5.0)),
+}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _ddl(fts: str, table: str, columns: Tuple[str, ...]) -> list:
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});"
+    return [
+        # Prefix indexes make short "dut*" style queries cheap
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        # Only text changes touch the index, not purchase toggles
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN {delete} {insert} END",
+    ]
+
+
+def schema_statements() -> list:
+    """Every statement create_search_index runs, for the schema fingerprint."""
+    return [statement for fts, (table, columns, _) in INDEXES.items() for statement in _ddl(fts, table, columns)]
+
+
+def create_search_index(db_engine) -> None:
+    """Create the FTS tables and triggers, indexing existing rows if new."""
+    with db_engine.begin() as conn:
+        existing = {
+            row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        }
+        for fts, (table, columns, _) in INDEXES.items():
+            for statement in _ddl(fts, table, columns):
+                conn.execute(text(statement))
+            if fts not in existing:
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def rebuild(db_engine) -> None:
+    """Re-index everything from the base tables and merge the index segments."""
+    with db_engine.begin() as conn:
+        for fts in INDEXES:
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('optimize')"))
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word must match as a prefix.
+
+    Only word characters reach FTS5, so user input can't inject operators.
+    """
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"o|{offset}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        tag, offset = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").split("|")
+        if tag != "o" or int(offset) < 0:
+            raise ValueError(cursor)
+        return int(offset)
+    except (ValueError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def search(db, model, query: str, cursor: Optional[str], limit: int, filters: Optional[dict] = None):
+    """Return (rows, next_cursor) for `model` rows matching `query`, best first.
+
+    Ranking needs every match scored anyway, so pages are addressed by
+    offset; the cursor stays opaque so that can change later.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return [], None
+
+    table = model.__tablename__
+    fts = f"{table}_fts"
+    weights = ", ".join(str(w) for w in INDEXES[fts][2])
+    where = [f"{fts} MATCH :match"]
+    params = {"match": expression, "limit": limit + 1, "offset": decode_cursor(cursor) if cursor else 0}
+    for column, value in (filters or {}).items():
+        if value is not None:
+            where.append(f"{table}.{column} = :{column}")
+            params[column] = value
+
+    stmt = text(
+        f"SELECT {table}.* FROM {fts} JOIN {table} ON {table}.id = {fts}.rowid "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY bm25({fts}, {weights}), {table}.id "
+        f"LIMIT :limit OFFSET :offset"
+    )
+    rows = db.query(model).from_statement(stmt).params(**params).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(params["offset"] + limit)
+    return rows, next_cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the full-text search index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild", help="Re-index all items and wishlists")
+    parser.parse_args()
+
+    database.init_db()
+    rebuild(database.engine)
+    print("Search index rebuilt", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Run the app in production: N uvicorn worker processes sharing one port.
+
+Usage:
+    python serve.py --workers 4
+    WISHLIST_WORKERS=4 python serve.py
+
+The database is initialized once here, before any worker starts. Workers
+keep their own caches and live-update subscribers and keep each other
+current over bus.py. For gunicorn (installed separately) use
+`gunicorn -c gunicorn.conf.py app:app`.
+"""
+import argparse
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.getenv("WISHLIST_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WISHLIST_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WISHLIST_WORKERS", "1")))
+    parser.add_argument("--reload", action="store_true", help="Restart on code changes (development, one worker)")
+    args = parser.parse_args()
+    if args.reload and args.workers > 1:
+        parser.error("--reload runs a single worker")
+
+    # Read by bus.py in every worker to decide whether to relay invalidations
+    os.environ["WISHLIST_WORKERS"] = str(args.workers)
+
+    import uvicorn
+
+    import assets
+    import database
+
+    # Refuses to start without the vendored libraries rather than serving pages without them
+    assets.prepare()
+    database.init_db()
+    # Workers open their own connections
+    database.engine.dispose()
+
+    print(f"Starting Wishlist App on http://{args.host}:{args.port} with {args.workers} worker(s)", file=sys.stderr)
+    uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers, reload=args.reload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# Settings are read at import time, so point the app at a scratch database
+# before anything imports it
+_data_dir = tempfile.mkdtemp(prefix="wishlist-tests-")
+os.environ.setdefault("WISHLIST_DB_PATH", os.path.join(_data_dir, "wishlists.db"))
+os.environ.setdefault("WISHLIST_BUS_DIR", os.path.join(_data_dir, "bus"))
+os.environ.setdefault("WISHLIST_BACKUP_DIR", os.path.join(_data_dir, "backups"))
+os.environ.setdefault("WISHLIST_RESPONSE_CACHE_DIR", os.path.join(_data_dir, "response-cache"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as app_module  # noqa: E402
+import database  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    # Runs the lifespan (init_db, bus) once for the whole session
+    with TestClient(app_module.app):
+        yield app_module.app
+
+
+@pytest.fixture
+def client(app):
+    """A client logged in as a fresh user."""
+    client = TestClient(app)
+    username, password = f"user-{uuid.uuid4().hex[:12]}", "secret"
+    client.post("/register", data={"username": username, "password": password}, follow_redirects=False)
+    response = client.post("/login", data={"username": username, "password": password}, follow_redirects=False)
+    client.cookies.set("access_token", response.cookies["access_token"])
+    return client
+
+
+@contextmanager
+def _count_statements():
+    engine = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def count_statements():
+    """`with count_statements() as statements:` collects the SQL run in the block."""
+    return _count_statements
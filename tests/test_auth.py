@@ -0,0 +1,57 @@
+from sqlalchemy import update
+
+import auth
+import database
+import models
+
+
+def cached_user_ids() -> set:
+    ids = set()
+    auth.principal_cache.delete_where(lambda _, principal: ids.add(principal.user.id))
+    return ids
+
+
+def cache_principal(client) -> int:
+    """Make an authenticated request, which caches the client's principal; returns its user id."""
+    wishlist = client.post("/api/wishlists", json={"name": "W", "person": "P"}).json()
+    assert wishlist["owner_id"] in cached_user_ids()
+    return wishlist["owner_id"]
+
+
+def test_user_is_invalidated_on_commit_not_flush(client):
+    user_id = cache_principal(client)
+    db = database.SessionLocal()
+    try:
+        user = db.get(models.User, user_id)
+        user.is_active = False
+        db.flush()
+        # Other requests still see the committed, active row
+        assert user_id in cached_user_ids()
+        db.commit()
+        assert user_id not in cached_user_ids()
+    finally:
+        db.close()
+    assert client.post("/api/wishlists", json={"name": "W", "person": "P"}).status_code == 401
+
+
+def test_rolled_back_change_keeps_the_cache(client):
+    user_id = cache_principal(client)
+    db = database.SessionLocal()
+    try:
+        db.get(models.User, user_id).email = f"{user_id}@example.com"
+        db.flush()
+        db.rollback()
+    finally:
+        db.close()
+    assert user_id in cached_user_ids()
+
+
+def test_update_statement_invalidates_users(client):
+    user_id = cache_principal(client)
+    db = database.SessionLocal()
+    try:
+        db.execute(update(models.User).where(models.User.id == user_id).values(is_active=False))
+        db.commit()
+    finally:
+        db.close()
+    assert user_id not in cached_user_ids()
@@ -0,0 +1,23 @@
+import time
+
+import backup
+
+
+def wishlist_names(client) -> set:
+    return {wishlist["name"] for wishlist in client.get("/api/wishlists").json()}
+
+
+def test_running_app_notices_a_restore(client):
+    client.post("/api/wishlists", json={"name": "Before snapshot", "person": "P"})
+    saved = backup.snapshot(label="test")
+    client.post("/api/wishlists", json={"name": "After snapshot", "person": "P"})
+    # Cached, and nothing in this process is told about the restore
+    assert "After snapshot" in wishlist_names(client)
+
+    backup.restore(saved)
+
+    deadline = time.monotonic() + 10
+    while "After snapshot" in wishlist_names(client):
+        assert time.monotonic() < deadline, "the app kept serving pre-restore data"
+        time.sleep(0.1)
+    assert "Before snapshot" in wishlist_names(client)
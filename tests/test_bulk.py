@@ -0,0 +1,85 @@
+from sqlalchemy import func, select
+
+import database
+import models
+import revisions
+
+
+def count_rows(model) -> int:
+    with database.engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model)).scalar_one()
+
+
+def current_revision() -> int:
+    with database.engine.connect() as conn:
+        return revisions.current_revision(conn)[0]
+
+
+def test_bulk_wishlists_empty_body_writes_nothing(client):
+    wishlists, revision = count_rows(models.Wishlist), current_revision()
+
+    response = client.post("/api/wishlists/bulk", json=[])
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert count_rows(models.Wishlist) == wishlists
+    assert current_revision() == revision
+    assert client.get("/api/wishlists").status_code == 200
+
+
+def test_bulk_items_empty_body_writes_nothing(client):
+    wishlist = client.post("/api/wishlists", json={"name": "Empty", "person": "P"}).json()
+    items, revision = count_rows(models.Item), current_revision()
+
+    response = client.post(f"/api/wishlists/{wishlist['id']}/items/bulk", json=[])
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert count_rows(models.Item) == items
+    assert current_revision() == revision
+
+
+def test_bulk_wishlists_match_their_items(client):
+    body = [
+        {"name": f"List {n}", "person": f"Person {n}", "items": [{"name": f"Item {n}.{i}"} for i in range(n)]}
+        for n in range(5)
+    ]
+
+    created = client.post("/api/wishlists/bulk", json=body).json()
+
+    assert [(w["name"], w["person"]) for w in created] == [(w["name"], w["person"]) for w in body]
+    for wishlist, sent in zip(created, body):
+        assert [item["name"] for item in wishlist["items"]] == [item["name"] for item in sent["items"]]
+        assert all(item["wishlist_id"] == wishlist["id"] for item in wishlist["items"])
+
+
+def writes(statements: list) -> int:
+    # Leaves out the change-log pruning every hundredth revision does
+    return sum(1 for statement in statements if not statement.startswith("DELETE FROM change_log"))
+
+
+def test_bulk_statements_do_not_grow_with_rows(client, count_statements):
+    def bulk_statements(wishlists: int, items: int) -> int:
+        body = [{"name": f"List {n}", "person": "P", "items": [{"name": f"Item {i}"} for i in range(items)]}
+                for n in range(wishlists)]
+        with count_statements() as statements:
+            response = client.post("/api/wishlists/bulk", json=body)
+        assert response.status_code == 200
+        assert sum(len(w["items"]) for w in response.json()) == wishlists * items
+        return writes(statements)
+
+    bulk_statements(1, 1)  # signs the client in, which is cached afterwards
+    assert bulk_statements(1, 1) == bulk_statements(20, 200)
+
+
+def test_bulk_items_statements_do_not_grow_with_rows(client, count_statements):
+    wishlist = client.post("/api/wishlists", json={"name": "Many", "person": "P"}).json()
+
+    def bulk_statements(items: int) -> int:
+        with count_statements() as statements:
+            response = client.post(f"/api/wishlists/{wishlist['id']}/items/bulk",
+                                   json=[{"name": f"Item {i}"} for i in range(items)])
+        assert [item["name"] for item in response.json()] == [f"Item {i}" for i in range(items)]
+        return writes(statements)
+
+    assert bulk_statements(1) == bulk_statements(500)
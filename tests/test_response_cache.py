@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from response_cache import ALL, TAIL, FileBackend, MemoryBackend, ResponseCache, wishlist_scope
+
+
+@pytest.fixture(params=["memory", "file"])
+def cache(request, tmp_path):
+    backend = MemoryBackend(64, 300) if request.param == "memory" else FileBackend(str(tmp_path), 300)
+    return ResponseCache(backend)
+
+
+def store(cache, key: str, revision: int, scopes: tuple) -> None:
+    cache.store(key, revision, key.encode(), "text/plain", {}, scopes)
+
+
+def cached(cache, key: str) -> bool:
+    return cache.backend.get(key) is not None
+
+
+def test_write_drops_only_entries_in_its_scopes(cache):
+    first, second = wishlist_scope(1), wishlist_scope(1000)
+    store(cache, "page-1", 5, (first,))
+    store(cache, "page-2", 5, (second, TAIL))
+    store(cache, "everything", 5, (ALL,))
+
+    cache.invalidate(6, [first])
+
+    assert not cached(cache, "page-1")
+    assert cached(cache, "page-2")
+    assert not cached(cache, "everything")
+
+    cache.invalidate(7, [TAIL])
+    assert not cached(cache, "page-2")
+
+
+def test_entry_read_before_a_write_is_not_stored_after_it(cache):
+    cache.invalidate(6, [wishlist_scope(1)])
+
+    store(cache, "stale", 5, (wishlist_scope(1),))
+    store(cache, "unrelated", 5, (wishlist_scope(1000),))
+    store(cache, "fresh", 6, (wishlist_scope(1),))
+
+    assert not cached(cache, "stale")
+    assert cached(cache, "unrelated")
+    assert cached(cache, "fresh")
+
+
+def test_entry_left_behind_by_an_invalidation_is_not_served(tmp_path):
+    backend = FileBackend(str(tmp_path), 300)
+    cache = ResponseCache(backend)
+    store(cache, "page", 5, (wishlist_scope(1),))
+    # As if its key had been lost from the scope's list
+    os.remove(os.path.join(tmp_path, "scopes", f"{wishlist_scope(1)}.keys"))
+
+    cache.invalidate(6, [wishlist_scope(1)])
+
+    assert os.path.exists(backend._path("page"))
+    assert not cached(cache, "page")
+
+
+def test_invalidate_without_scopes_drops_everything(cache):
+    store(cache, "page", 5, (wishlist_scope(1),))
+
+    cache.invalidate(6)
+
+    assert not cached(cache, "page")
+    store(cache, "stale", 5, (wishlist_scope(1000),))
+    assert not cached(cache, "stale")
+
+
+def test_purchase_keeps_other_pages_cached(client):
+    body = [{"name": f"List {n}", "person": "P", "items": [{"name": "Item"}]} for n in range(200)]
+    created = client.post("/api/wishlists/bulk", json=body).json()
+    params = {"owner_id": created[0]["owner_id"], "limit": 10}
+
+    def hits() -> int:
+        return client.get("/api/cache/stats").json()["responses"]["hits"]
+
+    first_page = client.get("/api/wishlists", params=params).json()
+    client.post(f"/api/items/{created[-1]['items'][0]['id']}/purchase")
+    before = hits()
+    assert client.get("/api/wishlists", params=params).json() == first_page
+    assert hits() == before + 1
+
+    client.post(f"/api/items/{created[0]['items'][0]['id']}/purchase")
+    before = hits()
+    assert client.get("/api/wishlists", params=params).json()[0]["items"][0]["purchased"] is True
+    assert hits() == before
@@ -0,0 +1,106 @@
+import io
+import json
+import os
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+import database
+import models
+import transfer
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    engines = []
+
+    def make(name: str):
+        engine = create_engine(f"sqlite:///{tmp_path / name}")
+        database.Base.metadata.create_all(engine)
+        engines.append(engine)
+        return engine
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+
+def seed(engine, username: str, wishlist: str, items: list) -> None:
+    with engine.begin() as conn:
+        user_id = conn.execute(models.User.__table__.insert().values(username=username, hashed_password="x")).inserted_primary_key[0]
+        wishlist_id = conn.execute(
+            models.Wishlist.__table__.insert().values(name=wishlist, person="P", owner_id=user_id)
+        ).inserted_primary_key[0]
+        for name in items:
+            conn.execute(models.Item.__table__.insert().values(name=name, wishlist_id=wishlist_id, purchased=False))
+
+
+def export(engine) -> bytes:
+    with engine.connect() as conn:
+        return b"".join(transfer.export_lines(conn, include_hashes=True))
+
+
+def item_names(engine) -> list:
+    with engine.connect() as conn:
+        return conn.execute(select(models.Item.name).order_by(models.Item.id)).scalars().all()
+
+
+def test_import_refuses_a_non_empty_database(make_engine, tmp_path):
+    source, target = make_engine("source.db"), make_engine("target.db")
+    seed(source, "alice", "Birthday", ["Book", "Lamp"])
+    seed(target, "bob", "Private", ["Secret"])
+
+    with pytest.raises(ValueError):
+        transfer.import_lines(target, io.BytesIO(export(source)), checkpoint_path=str(tmp_path / "progress"))
+
+    assert item_names(target) == ["Secret"]
+
+
+def test_resumed_import_skips_rows_it_already_wrote(make_engine, tmp_path):
+    source, target = make_engine("source.db"), make_engine("target.db")
+    seed(source, "alice", "Birthday", ["Book", "Lamp"])
+    data, checkpoint = export(source), str(tmp_path / "progress")
+    transfer.import_lines(target, io.BytesIO(data), batch_size=1, checkpoint_path=checkpoint)
+
+    # As if the process died after the last batch committed but before its
+    # checkpoint was written
+    transfer._write_checkpoint(checkpoint, 2)
+    transfer.import_lines(target, io.BytesIO(data), batch_size=1, checkpoint_path=checkpoint)
+
+    assert item_names(target) == ["Book", "Lamp"]
+
+
+def test_resumed_import_stops_on_a_changed_row(make_engine, tmp_path):
+    source, target = make_engine("source.db"), make_engine("target.db")
+    seed(source, "alice", "Birthday", ["Book", "Lamp"])
+    data, checkpoint = export(source), str(tmp_path / "progress")
+    transfer.import_lines(target, io.BytesIO(data), checkpoint_path=checkpoint)
+    with target.begin() as conn:
+        conn.execute(models.Wishlist.__table__.update().values(name="Renamed"))
+
+    transfer._write_checkpoint(checkpoint, 0)
+    with pytest.raises(ValueError):
+        transfer.import_lines(target, io.BytesIO(data), checkpoint_path=checkpoint)
+
+    with target.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(models.Item)).scalar_one() == 2
+    assert os.path.exists(checkpoint)
+
+
+def test_export_is_one_snapshot(make_engine):
+    engine = make_engine("live.db")
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    seed(engine, "alice", "Birthday", ["Book"])
+
+    with engine.connect() as conn:
+        lines = transfer.export_lines(conn, include_hashes=True)
+        first = next(lines)  # users have been read
+        # Committed while the export is still running
+        seed(engine, "bob", "Later", ["Lamp"])
+        records = [json.loads(line) for line in [first, *lines]]
+
+    users = {r["data"]["id"] for r in records if r["type"] == "user"}
+    wishlists = {r["data"]["id"] for r in records if r["type"] == "wishlist"}
+    assert {r["data"]["owner_id"] for r in records if r["type"] == "wishlist"} <= users
+    assert {r["data"]["wishlist_id"] for r in records if r["type"] == "item"} <= wishlists
+    assert len(wishlists) == 1
@@ -0,0 +1,28 @@
+import pytest
+
+import serialize
+
+
+def add_wishlist(client, name: str, items: int) -> dict:
+    body = [{"name": name, "person": "P", "items": [{"name": f"{name} item {i}"} for i in range(items)]}]
+    return client.post("/api/wishlists/bulk", json=body).json()[0]
+
+
+@pytest.mark.parametrize("fast_json", [True, False])
+def test_listing_wishlists_does_not_query_per_wishlist(client, count_statements, monkeypatch, fast_json):
+    monkeypatch.setattr(serialize, "FAST_JSON", fast_json)
+    owner_id = add_wishlist(client, "First", items=3)["owner_id"]
+
+    def list_statements() -> tuple:
+        with count_statements() as statements:
+            response = client.get("/api/wishlists", params={"owner_id": owner_id})
+        assert response.status_code == 200
+        return len(response.json()), len(statements)
+
+    one = list_statements()
+    for n in range(9):
+        add_wishlist(client, f"More {n}", items=3)
+    many = list_statements()
+
+    assert one[0] == 1 and many[0] == 10
+    assert many[1] == one[1]
@@ -0,0 +1,218 @@
+"""Streaming NDJSON export and import of the whole dataset.
+
+Every line is one row: {"type": "user", "data": {...}}. Tables are written
+parents first (users, wishlists, shares, items) so an import can insert
+them in file order without violating foreign keys.
+
+Usage:
+    python transfer.py export backup.ndjson [--include-hashes]
+    python transfer.py import backup.ndjson [--batch-size 1000]
+
+Imports go into an empty database: ids are kept, so rows from another
+dataset would collide with them. An interrupted import is resumed by running
+the same command again: the last committed line is kept in <input>.progress
+until the import finishes.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import IO, Iterator, Optional
+
+from sqlalchemy import DateTime, select
+from sqlalchemy.dialects.sqlite import insert
+
+import database
+import models
+import revisions
+from response_cache import response_cache
+
+# Export order matters: parents before children
+TABLES = {
+    "user": models.User.__table__,
+    "wishlist": models.Wishlist.__table__,
+    "share": models.WishlistShare.__table__,
+    "item": models.Item.__table__,
+}
+
+# Rows fetched per round-trip while streaming
+EXPORT_BATCH_SIZE = 1000
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def export_lines(connection, include_hashes: bool = False) -> Iterator[bytes]:
+    """Yield the dataset as NDJSON lines, one row at a time.
+
+    Rows are read with yield_per over plain Core selects, so memory stays flat
+    no matter how large the tables are and no ORM objects are built. All
+    tables are read in one pinned read transaction, as backup.copy_database
+    does: each SELECT would otherwise see the database as of its own start,
+    and a write committed in between could leave children in the file
+    without their parents.
+    """
+    connection.exec_driver_sql("BEGIN")
+    try:
+        streaming = connection.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        for kind, table in TABLES.items():
+            columns = [c for c in table.columns if include_hashes or c.name != "hashed_password"]
+            result = streaming.execute(select(*columns).order_by(table.c.id))
+            for row in result.mappings():
+                line = json.dumps({"type": kind, "data": dict(row)}, default=_json_default)
+                yield line.encode("utf-8") + b"\n"
+    finally:
+        connection.rollback()
+
+
+def _row_parser(table):
+    datetime_columns = [c.name for c in table.columns if isinstance(c.type, DateTime)]
+
+    def parse(data: dict) -> dict:
+        for name in datetime_columns:
+            if data.get(name) is not None:
+                data[name] = datetime.fromisoformat(data[name])
+        return data
+    return parse
+
+
+def _read_checkpoint(path: str) -> int:
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_checkpoint(path: str, line_number: int) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(line_number))
+    os.replace(tmp_path, path)
+
+
+def _check_empty(connection) -> None:
+    for kind, table in TABLES.items():
+        if connection.execute(select(table.c.id).limit(1)).first() is not None:
+            raise ValueError(
+                f"The database already has {table.name}; imports keep their ids, "
+                "so they only go into an empty database"
+            )
+
+
+def _new_rows(connection, kind: str, batch: list) -> list:
+    """Drop rows that are already stored identically; a replayed batch has some.
+
+    A stored row that differs from the imported one means the ids belong to
+    other data, and its children would attach to the wrong parent.
+    """
+    table = TABLES[kind]
+    existing = {
+        row["id"]: row
+        for row in connection.execute(
+            select(table).where(table.c.id.in_([data["id"] for data in batch]))
+        ).mappings()
+    }
+    if not existing:
+        return batch
+    for data in batch:
+        stored = existing.get(data["id"])
+        if stored is not None and any(stored[name] != value for name, value in data.items()):
+            raise ValueError(f"{kind} {data['id']} already exists with different data")
+    return [data for data in batch if data["id"] not in existing]
+
+
+def import_lines(
+    db_engine,
+    lines: IO[bytes],
+    batch_size: int = 1000,
+    checkpoint_path: Optional[str] = None,
+) -> int:
+    """Insert rows from an NDJSON stream in batched transactions.
+
+    The database must be empty, unless this is a rerun of an import that
+    left checkpoint_path behind. Each batch is committed on its own and
+    recorded in checkpoint_path, so a rerun skips work that is already done;
+    rows of a replayed batch that are already stored unchanged are skipped,
+    and any other id conflict raises ValueError before the batch is written.
+    Returns the number of lines processed.
+    """
+    resuming = checkpoint_path is not None and os.path.exists(checkpoint_path)
+    if not resuming:
+        with db_engine.connect() as conn:
+            _check_empty(conn)
+        if checkpoint_path:
+            # From here on a rerun resumes, even if the first batch commits
+            # and the process dies before its checkpoint is written
+            _write_checkpoint(checkpoint_path, 0)
+    start = _read_checkpoint(checkpoint_path) if checkpoint_path else 0
+    parsers = {kind: _row_parser(table) for kind, table in TABLES.items()}
+    batch_kind, batch = None, []
+    line_number = 0
+
+    def flush(done_through: int):
+        if batch:
+            with db_engine.begin() as conn:
+                rows = _new_rows(conn, batch_kind, batch)
+                if rows:
+                    conn.execute(insert(TABLES[batch_kind]), rows)
+                changes = [(batch_kind, row["id"]) for row in batch] if batch_kind in ("wishlist", "item") else ()
+                revision = revisions.bump_revision(conn, changes)
+            response_cache.invalidate(revision)
+            batch.clear()
+        if checkpoint_path:
+            _write_checkpoint(checkpoint_path, done_through)
+
+    for line_number, line in enumerate(lines, start=1):
+        if line_number <= start or not line.strip():
+            continue
+        record = json.loads(line)
+        kind = record["type"]
+        if kind not in TABLES:
+            raise ValueError(f"Line {line_number}: unknown record type {kind!r}")
+        if kind != batch_kind or len(batch) >= batch_size:
+            flush(line_number - 1)
+            batch_kind = kind
+        batch.append(parsers[kind](record["data"]))
+    flush(line_number)
+    return line_number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import the wishlist dataset as NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Write the dataset to a file (or - for stdout)")
+    export_cmd.add_argument("output")
+    export_cmd.add_argument("--include-hashes", action="store_true", help="Include password hashes")
+
+    import_cmd = commands.add_parser("import", help="Load a dataset exported with this tool")
+    import_cmd.add_argument("input")
+    import_cmd.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        with database.engine.connect() as conn, out:
+            for line in export_lines(conn, include_hashes=args.include_hashes):
+                out.write(line)
+        return
+
+    database.init_db()
+    checkpoint_path = f"{args.input}.progress"
+    with open(args.input, "rb") as lines:
+        try:
+            count = import_lines(database.engine, lines, args.batch_size, checkpoint_path)
+        except ValueError as e:
+            raise SystemExit(f"Import stopped: {e}")
+    os.remove(checkpoint_path)
+    print(f"Imported {count} lines from {args.input}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
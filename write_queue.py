@@ -0,0 +1,167 @@
+"""Optional group commit for the high-frequency mutations.
+
+With WISHLIST_GROUP_COMMIT on, purchase toggles and item additions are not
+committed by the request that made them. They are handed to a single writer
+thread, which runs every unit of work that queued up while it was committing
+the previous batch (up to a batch size) in one BEGIN IMMEDIATE transaction
+and commits once. So an idle server adds no latency, and batches grow with
+load. WISHLIST_GROUP_COMMIT_MS additionally holds each batch open for more
+work, which only pays off when commits are expensive (fsync on slow disks).
+Each unit runs inside its own SAVEPOINT, so one that raises (a 404, a 409
+conflict) is rolled back alone and its request gets the exception, while the
+rest of the batch still commits.
+
+One writer means requests never race each other for SQLite's write lock,
+and one commit per batch means one WAL sync per batch instead of per click.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.util import await_only
+
+import database
+
+logger = logging.getLogger(__name__)
+
+GROUP_COMMIT = os.getenv("WISHLIST_GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+# Longest a batch stays open for more work after its first unit arrives
+GROUP_COMMIT_MS = float(os.getenv("WISHLIST_GROUP_COMMIT_MS", "0"))
+GROUP_COMMIT_MAX = int(os.getenv("WISHLIST_GROUP_COMMIT_MAX", "64"))
+
+Work = Callable  # work(session) -> result
+
+
+class WriteQueue:
+    """A single writer thread that commits queued units of work in batches."""
+
+    def __init__(self, session_factory, max_delay: float, max_batch: int):
+        self.session_factory = session_factory
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._queue: "queue.SimpleQueue[Tuple[Work, Future]]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, work: Work) -> Future:
+        """Queue work(session); the future resolves once its batch has committed."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="wishlist-writer", daemon=True)
+                self._thread.start()
+        future: Future = Future()
+        self._queue.put((work, future))
+        return future
+
+    def _next_batch(self) -> List[Tuple[Work, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Work that queued up while the last batch committed is taken
+                # without waiting, so a delay of 0 still batches under load
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = [(work, future) for work, future in self._next_batch() if future.set_running_or_notify_cancel()]
+            if batch:
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[Tuple[Work, Future]]) -> None:
+        # Lock errors are retried for the whole batch, like retry_on_locked
+        # does for a single request; the units of work are re-run from scratch
+        for delay in list(database.backoff_delays()) + [None]:
+            try:
+                outcomes = self._apply(batch)
+            except OperationalError as e:
+                if delay is None or not database.is_lock_error(e):
+                    for _, future in batch:
+                        future.set_exception(e)
+                    return
+                logger.warning(f"Database locked, retrying batch of {len(batch)} writes")
+                time.sleep(delay)
+                continue
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            self.batches += 1
+            self.writes += len(batch)
+            for (_, future), (ok, value) in zip(batch, outcomes):
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            return
+
+    def _apply(self, batch: List[Tuple[Work, Future]]) -> list:
+        outcomes = []
+        with self.session_factory() as session:
+            # Take the write lock up front; pysqlite would otherwise start a
+            # deferred transaction and SAVEPOINT/RELEASE would commit each unit
+            session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            for work, _ in batch:
+                savepoint = session.begin_nested()
+                try:
+                    result = work(session)
+                except OperationalError as e:
+                    if database.is_lock_error(e):
+                        raise
+                    savepoint.rollback()
+                    outcomes.append((False, e))
+                except Exception as e:
+                    savepoint.rollback()
+                    outcomes.append((False, e))
+                else:
+                    savepoint.commit()
+                    outcomes.append((True, result))
+            session.commit()
+        return outcomes
+
+    def stats(self) -> dict:
+        return {
+            "enabled": GROUP_COMMIT,
+            "batches": self.batches,
+            "writes": self.writes,
+            "mean_batch": round(self.writes / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+writer = WriteQueue(database.SessionLocal, GROUP_COMMIT_MS / 1000, GROUP_COMMIT_MAX)
+
+
+def run_write(db, work: Work):
+    """Run work(session) and commit it, directly or through the group-commit queue.
+
+    Called from endpoint bodies, which run on the threadpool in sync mode and
+    inside AsyncSession.run_sync's greenlet in async mode. Anything the caller
+    needs after the commit (ids, rows, the revision) must be returned by
+    `work` as plain values, since the writer's session is closed by then.
+    """
+    if not GROUP_COMMIT:
+        try:
+            result = work(db)
+        except Exception:
+            db.rollback()
+            raise
+        db.commit()
+        return result
+
+    future = writer.submit(work)
+    if database.DB_ASYNC:
+        # Suspend this request's greenlet instead of blocking the event loop
+        return await_only(asyncio.wrap_future(future))
+    return future.result()